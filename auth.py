@@ -0,0 +1,64 @@
+import logging
+import os
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from cache import CachedUser, user_cache
+from utils import JWT_SECRET_FROM_ENV, decode_access_token
+
+# 로그인 시 발급한 JWT 검증 - DB 조회 없이 토큰 서명만 확인
+
+# true 이면 /users/{user_id}/... 요청에 토큰이 반드시 필요 (기존 앱 호환을 위해 기본값은 false)
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+# 기본 비밀키는 공개돼 있어 누구나 아무 사용자의 토큰을 만들 수 있음 - 토큰 검증을 강제한다면 서버를 띄우지 않음
+if not JWT_SECRET_FROM_ENV:
+    if AUTH_REQUIRED:
+        raise RuntimeError("AUTH_REQUIRED=true requires JWT_SECRET_KEY to be set")
+    logger.warning("JWT_SECRET_KEY is not set; access tokens are signed with a public default key and must not be trusted")
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def authenticate_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> Optional[CachedUser]:
+    """
+    토큰만 검증하고 토큰의 사용자 정보를 반환 (다른 사용자의 프로필처럼 누구나 볼 수 있는 조회용)
+    토큰이 없으면 (AUTH_REQUIRED=false 일 때) None 반환
+    """
+    if credentials is None:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+
+    payload = decode_access_token(credentials.credentials)
+    if not payload or not str(payload.get("sub", "")).isdigit():
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+
+    # 토큰은 로그인한(존재하는) 사용자에게만 발급되므로 캐시에 없으면 토큰 내용으로 채움
+    token_user_id = int(payload["sub"])
+    user = user_cache.get_cached(token_user_id)
+    if user is None:
+        user = CachedUser(token_user_id, payload.get("kakao_id"), payload.get("nickname"), payload.get("profile_image"))
+        user_cache.put(user)
+    return user
+
+
+def ensure_owner(user: Optional[CachedUser], user_id: int) -> Optional[CachedUser]:
+    """
+    토큰의 사용자가 user_id 본인인지 확인 (토큰 없이 허용된 요청은 그대로 통과)
+    """
+    if user is not None and user.id != user_id:
+        raise HTTPException(status_code=403, detail="Token does not match the requested user")
+    return user
+
+
+def get_current_user(user_id: int, user: Optional[CachedUser] = Depends(authenticate_user)) -> Optional[CachedUser]:
+    """
+    경로의 user_id 와 토큰의 사용자가 같은지 확인하고 사용자 정보를 반환 (본인 데이터 조회/수정용)
+    토큰이 없으면 (AUTH_REQUIRED=false 일 때) None 반환 - 이 경우 crud 에서 사용자 존재 여부를 직접 확인
+    """
+    return ensure_owner(user, user_id)
@@ -0,0 +1,639 @@
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+# API 벤치마크 - 합성 데이터 DB 생성(seed)과 전체 라우트 부하 측정(run)
+#
+#   python benchmark.py seed --users 100 --rows-per-user 1000
+#   python benchmark.py run --concurrency 16 --requests 200 --output before.json
+#
+# 모든 데이터(app.db, static/uploads)는 --workdir(기본: bench_data) 아래에 만들어지므로 저장소의 app.db 는 건드리지 않음
+# 앱 모듈(database, main 등)은 DB 경로 환경 변수를 설정한 뒤에 import 해야 하므로 함수 안에서 import
+
+EXERCISE_BASE_NAMES = [
+    ("벤치프레스", "가슴"), ("인클라인 벤치프레스", "가슴"), ("덤벨 플라이", "가슴"), ("푸쉬업", "가슴"),
+    ("스쿼트", "하체"), ("레그프레스", "하체"), ("런지", "하체"), ("레그 익스텐션", "하체"), ("레그 컬", "하체"),
+    ("데드리프트", "등"), ("바벨 로우", "등"), ("랫풀다운", "등"), ("풀업", "등"), ("시티드 로우", "등"),
+    ("오버헤드 프레스", "어깨"), ("사이드 레터럴 레이즈", "어깨"), ("페이스 풀", "어깨"),
+    ("바벨 컬", "팔"), ("해머 컬", "팔"), ("트라이셉스 익스텐션", "팔"), ("딥스", "팔"),
+    ("크런치", "복근"), ("플랭크", "복근"), ("행잉 레그 레이즈", "복근"),
+]
+EXERCISE_VARIANTS = ["", " (머신)", " (덤벨)", " (케이블)"]
+
+BATCH_SIZE = 5000
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 요청별 SQL 실행 횟수 - 요청을 보내는 태스크에서 설정하면 스레드풀/greenlet 안의 DB 호출까지 같은 컨텍스트로 전달됨
+_sql_counter: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bench_sql_counter", default=None)
+
+
+def configure_environment(workdir: str, db_mode: Optional[str] = None) -> str:
+    """
+    작업 디렉터리와 DB 접속 환경 변수 설정 (앱 모듈 import 전에 호출)
+    """
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.abspath(os.path.join(workdir, "app.db"))
+    os.chdir(workdir)
+    sys.path.insert(0, BASE_DIR)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("DATABASE_READ_URL", None)
+    if db_mode:
+        os.environ["DB_MODE"] = db_mode
+    return db_path
+
+
+# ---------------------------------------------------------------------------
+# 합성 데이터 생성
+# ---------------------------------------------------------------------------
+
+def friend_edges(user_ids: List[int], avg_degree: int, rng: random.Random) -> set:
+    """
+    선호적 연결(Barabási–Albert) 방식의 친구 그래프 - 대부분은 친구가 적고 일부만 아주 많은 멱법칙 분포
+    """
+    m = max(1, avg_degree // 2)
+    edges = set()
+    targets: List[int] = list(user_ids[: m + 1])
+    for index, user_id in enumerate(user_ids[m + 1:], start=m + 1):
+        chosen = set()
+        while len(chosen) < min(m, index):
+            chosen.add(rng.choice(targets))
+        for friend_id in chosen:
+            edges.add((min(user_id, friend_id), max(user_id, friend_id)))
+            targets.append(friend_id)
+        targets.extend([user_id] * len(chosen))
+    return edges
+
+
+def sample_images(count: int, rng: random.Random) -> List[bytes]:
+    """
+    업로드/미디어 라우트용 작은 JPEG 이미지 (Pillow 가 없으면 임의 바이트)
+    """
+    images = []
+    for _ in range(count):
+        try:
+            from PIL import Image
+
+            buffer = io.BytesIO()
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new("RGB", (640, 480), color).save(buffer, format="JPEG", quality=85)
+            images.append(buffer.getvalue())
+        except ImportError:
+            images.append(rng.randbytes(64 * 1024))
+    return images
+
+
+def _insert_batches(connection, table, rows: List[dict]):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def seed_database(args) -> dict:
+    db_path = configure_environment(args.workdir)
+    if os.path.exists(db_path):
+        if not args.reset:
+            raise SystemExit(f"{db_path} already exists (use --reset to recreate it)")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    from database import Base, SessionLocal, engine
+    from models import BodyMetrics, ExerciseName, Friend, MealPhoto, OwnPhoto, PhotoBlob, Record, Routine, User
+    from uploads import UPLOAD_DIR, blob_path
+    from crud import backfill_body_metrics_rollups, backfill_timelines, backfill_user_stats
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+
+    # 사진 파일 - 내용 주소(sha256) 파일 몇 개를 모든 사진이 나눠서 참조
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    blob_paths = []
+    for image in sample_images(args.blobs, rng):
+        digest = hashlib.sha256(image).hexdigest()
+        path = blob_path(digest)
+        with open(path, "wb") as f:
+            f.write(image)
+        blob_paths.append(path.replace(os.sep, "/"))
+    blob_refs = Counter()
+
+    now = datetime.now().replace(microsecond=0)
+    user_ids = list(range(1, args.users + 1))
+    counts = {}
+
+    with engine.begin() as connection:
+        _insert_batches(connection, ExerciseName.__table__, [
+            {"name": f"{name}{variant}", "target_area": area}
+            for name, area in EXERCISE_BASE_NAMES for variant in EXERCISE_VARIANTS
+        ])
+        exercise_ids = list(range(1, len(EXERCISE_BASE_NAMES) * len(EXERCISE_VARIANTS) + 1))
+
+        _insert_batches(connection, User.__table__, [
+            {"id": user_id, "kakao_id": f"bench-{user_id}", "nickname": f"user{user_id}", "profile_image": f"https://example.com/{user_id}.jpg"}
+            for user_id in user_ids
+        ])
+
+        edges = friend_edges(user_ids, args.avg_friends, rng)
+        friend_rows = [{"user_id": a, "friend_id": b} for a, b in edges] + [{"user_id": b, "friend_id": a} for a, b in edges]
+        _insert_batches(connection, Friend.__table__, friend_rows)
+        counts["friends"] = len(friend_rows)
+
+        for key in ("own_photos", "meal_photos", "body_metrics", "records", "routines"):
+            counts[key] = 0
+        for user_id in user_ids:
+            own_rows, meal_rows, metrics_rows, record_rows = [], [], [], []
+            for _ in range(args.rows_per_user):
+                photo_path = rng.choice(blob_paths)
+                blob_refs[photo_path] += 1
+                own_rows.append({
+                    "user_id": user_id,
+                    "datetime": now - timedelta(seconds=rng.randrange(args.days * 86400)),
+                    "photo_path": photo_path,
+                    "is_uploaded": rng.random() < args.uploaded_ratio,
+                })
+                photo_path = rng.choice(blob_paths)
+                blob_refs[photo_path] += 1
+                meal_rows.append({
+                    "user_id": user_id,
+                    "datetime": now - timedelta(seconds=rng.randrange(args.days * 86400)),
+                    "photo_path": photo_path,
+                })
+
+            # 체중 기록은 하루 하나씩, 최근 날짜부터 rows-per-user 일
+            weight = rng.uniform(50, 100)
+            for offset in range(args.rows_per_user):
+                weight += rng.uniform(-0.3, 0.3)
+                metrics_rows.append({
+                    "user_id": user_id,
+                    "record_date": now.date() - timedelta(days=args.rows_per_user - 1 - offset),
+                    "weight": round(weight, 1),
+                    "muscle_mass": round(weight * rng.uniform(0.38, 0.45), 1),
+                    "body_fat_percentage": round(rng.uniform(10, 30), 1),
+                })
+                record_rows.append({
+                    "user_id": user_id,
+                    "datetime": now - timedelta(seconds=rng.randrange(args.days * 86400)),
+                    "weight": int(weight),
+                    "body_fat": rng.randrange(8, 30),
+                    "muscle_mass": rng.randrange(20, 45),
+                })
+
+            routine_rows = [
+                {"routine_id": routine_id, "user_id": user_id, "exercise_id": exercise_id, "routine_name": f"루틴 {routine_id}",
+                 "sets": rng.randrange(3, 6), "reps": rng.randrange(5, 16)}
+                for routine_id in range(1, args.routines_per_user + 1)
+                for exercise_id in rng.sample(exercise_ids, 5)
+            ]
+
+            _insert_batches(connection, OwnPhoto.__table__, own_rows)
+            _insert_batches(connection, MealPhoto.__table__, meal_rows)
+            _insert_batches(connection, BodyMetrics.__table__, metrics_rows)
+            _insert_batches(connection, Record.__table__, record_rows)
+            _insert_batches(connection, Routine.__table__, routine_rows)
+            counts["own_photos"] += len(own_rows)
+            counts["meal_photos"] += len(meal_rows)
+            counts["body_metrics"] += len(metrics_rows)
+            counts["records"] += len(record_rows)
+            counts["routines"] += len(routine_rows)
+
+        _insert_batches(connection, PhotoBlob.__table__, [
+            {"sha256": os.path.splitext(os.path.basename(path))[0], "path": path, "ref_count": blob_refs[path], "created_at": now}
+            for path in blob_paths
+        ])
+
+    # 집계 테이블은 서버 시작 시에도 백필되지만 측정에 섞이지 않도록 미리 생성
+    db = SessionLocal()
+    try:
+        backfill_user_stats(db)
+        backfill_body_metrics_rollups(db)
+        backfill_timelines(db)
+    finally:
+        db.close()
+
+    counts["users"] = len(user_ids)
+    return {"database": db_path, "seconds": round(time.perf_counter() - started, 2), "rows": counts}
+
+
+# ---------------------------------------------------------------------------
+# 부하 측정
+# ---------------------------------------------------------------------------
+
+class Scenario(NamedTuple):
+    method: str
+    path: str  # main.py 라우트 경로 템플릿 (커버리지 확인용)
+    build: Callable  # (ctx, rng) -> (url, httpx 요청 인자)
+
+
+class BenchContext:
+    """
+    시나리오가 요청을 만들 때 사용하는 DB 샘플 (사용자, 사진, 루틴, 토큰)
+    """
+
+    def __init__(self, db, rng: random.Random):
+        from sqlalchemy import func
+        from models import OwnPhoto, PhotoBlob, Routine, User
+        from utils import create_access_token
+
+        # 시드 사용자만 사용 (login 시나리오로 가입된 사용자는 데이터가 없어 404 가 섞임)
+        self.user_ids = [row.id for row in db.query(User.id).filter(~User.kakao_id.like("bench-new-%")).all()]
+        if not self.user_ids:
+            raise SystemExit("The benchmark database is empty (run `python benchmark.py seed` first)")
+        self.photo_ids = dict(db.query(OwnPhoto.user_id, func.min(OwnPhoto.id)).group_by(OwnPhoto.user_id).all())
+        self.routines: Dict[int, Dict[int, List[dict]]] = {}
+        for row in db.query(Routine.user_id, Routine.routine_id, Routine.exercise_id, Routine.sets, Routine.reps):
+            self.routines.setdefault(row.user_id, {}).setdefault(row.routine_id, []).append(
+                {"exercise_id": row.exercise_id, "sets": row.sets, "reps": row.reps}
+            )
+        self.blob_names = [os.path.basename(row.path) for row in db.query(PhotoBlob.path).all()]
+        self.images = sample_images(4, rng)
+        self.tokens = {
+            user_id: create_access_token({"sub": str(user_id)}, timedelta(hours=12))
+            for user_id in self.user_ids
+        }
+        self.login_counter = 0
+
+    def user(self, rng: random.Random):
+        """
+        무작위 사용자 ID 와 인증 헤더
+        """
+        user_id = rng.choice(self.user_ids)
+        return user_id, {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def routine(self, rng: random.Random):
+        user_id, headers = self.user(rng)
+        routines = self.routines.get(user_id) or {1: [{"exercise_id": 1, "sets": 3, "reps": 10}]}
+        routine_id = rng.choice(list(routines))
+        return user_id, headers, routine_id, routines[routine_id]
+
+
+def _user_get(path: str, params: Optional[Callable] = None) -> Scenario:
+    def build(ctx: BenchContext, rng: random.Random):
+        user_id, headers = ctx.user(rng)
+        return path.format(user_id=user_id), {"headers": headers, "params": params(rng) if params else None}
+    return Scenario("GET", path, build)
+
+
+def _photo_upload(path: str) -> Scenario:
+    def build(ctx: BenchContext, rng: random.Random):
+        user_id, headers = ctx.user(rng)
+        return path.format(user_id=user_id), {"headers": headers, "files": {"file": ("photo.jpg", rng.choice(ctx.images), "image/jpeg")}}
+    return Scenario("POST", path, build)
+
+
+def _login(ctx: BenchContext, rng: random.Random):
+    # 기존 사용자 로그인과 신규 가입을 번갈아 측정
+    ctx.login_counter += 1
+    if ctx.login_counter % 2:
+        user_id = rng.choice(ctx.user_ids)
+        body = {"kakao_id": f"bench-{user_id}", "nickname": f"user{user_id}", "profile_image": None}
+    else:
+        body = {"kakao_id": f"bench-new-{os.getpid()}-{time.time_ns()}", "nickname": "new", "profile_image": None}
+    return "/users/login", {"json": body}
+
+
+def _create_friend(ctx: BenchContext, rng: random.Random):
+    scanned, headers = ctx.user(rng)
+    qr = rng.choice([user_id for user_id in ctx.user_ids if user_id != scanned])
+    return "/friends", {"headers": headers, "json": {"scanned_user_id": scanned, "qr_user_id": qr}}
+
+
+def _save_temporary_routines(ctx: BenchContext, rng: random.Random):
+    user_id, headers = ctx.user(rng)
+    routine_id = rng.randrange(1000, 100000)
+    routines = [
+        {"routine_id": routine_id, "user_id": user_id, "exercise_id": exercise_id, "sets": 3, "reps": 10}
+        for exercise_id in rng.sample(range(1, 50), 5)
+    ]
+    return f"/users/{user_id}/routines/temporary", {"headers": headers, "json": {"routines": routines}}
+
+
+def _update_routine_name(ctx: BenchContext, rng: random.Random):
+    user_id, headers, routine_id, _ = ctx.routine(rng)
+    return f"/users/{user_id}/routines/{routine_id}/update_name", {"headers": headers, "params": {"routine_name": f"루틴 {rng.randrange(100)}"}}
+
+
+def _update_routine(ctx: BenchContext, rng: random.Random):
+    user_id, headers, routine_id, exercises = ctx.routine(rng)
+    body = {
+        "routine_id": routine_id,
+        "routine_name": f"루틴 {rng.randrange(100)}",
+        "exercises": [dict(exercise, reps=rng.randrange(5, 16)) for exercise in exercises],
+    }
+    return f"/users/{user_id}/routines/{routine_id}/update", {"headers": headers, "json": body}
+
+
+def _create_record(ctx: BenchContext, rng: random.Random):
+    user_id, headers = ctx.user(rng)
+    return f"/users/{user_id}/records", {"headers": headers, "json": {"weight": 70, "body_fat": 15, "muscle_mass": 35}}
+
+
+def _calendar_params(rng: random.Random):
+    end = date.today().replace(day=1)
+    start = (end - timedelta(days=rng.randrange(0, 700))).replace(day=1)
+    return {"from": start.strftime("%Y-%m"), "to": end.strftime("%Y-%m")}
+
+
+def _meal_photo_params(rng: random.Random):
+    # 식단 화면처럼 하루/한 주 범위 조회 위주, 가끔 전체 조회와 페이지 조회
+    end = date.today() - timedelta(days=rng.randrange(0, 365))
+    return rng.choice([
+        {},
+        {"limit": 50},
+        {"from": str(end), "to": str(end), "group_by": "day"},
+        {"from": str(end - timedelta(days=6)), "to": str(end), "group_by": "day"},
+    ])
+
+
+def _save_photo(path: str) -> Scenario:
+    def build(ctx: BenchContext, rng: random.Random):
+        user_id, headers = ctx.user(rng)
+        photo_path = f"static/uploads/{rng.choice(ctx.blob_names)}" if ctx.blob_names else "static/uploads/bench.jpg"
+        return path.format(user_id=user_id), {"headers": headers, "json": {"photo_path": photo_path}}
+    return Scenario("POST", path, build)
+
+
+def _social_upload(ctx: BenchContext, rng: random.Random):
+    user_id, headers = ctx.user(rng)
+    return f"/users/{user_id}/social/upload", {"headers": headers, "json": {"photo_id": ctx.photo_ids.get(user_id, 0), "base64_image": ""}}
+
+
+def _create_body_metrics(ctx: BenchContext, rng: random.Random):
+    user_id, headers = ctx.user(rng)
+    body = {
+        "record_date": str(date.today() - timedelta(days=rng.randrange(30))),
+        "weight": round(rng.uniform(50, 100), 1),
+        "muscle_mass": round(rng.uniform(20, 45), 1),
+        "body_fat_percentage": round(rng.uniform(10, 30), 1),
+    }
+    return f"/users/{user_id}/body_metrics", {"headers": headers, "json": body}
+
+
+def _media(method: str) -> Scenario:
+    def build(ctx: BenchContext, rng: random.Random):
+        name = rng.choice(ctx.blob_names) if ctx.blob_names else "missing.jpg"
+        return f"/static/uploads/{name}", {}
+    return Scenario(method, "/static/uploads/{file_path:path}", build)
+
+
+def _exercise_search(ctx: BenchContext, rng: random.Random):
+    query = rng.choice(["벤치", "스쿼트", "ㅂㅊ", "ㄷㄹ", "컬", "프레스", "로우"])
+    return "/exercises/search", {"params": {"query": query, "limit": 20}}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("GET", "/", lambda ctx, rng: ("/", {})),
+    Scenario("GET", "/users", lambda ctx, rng: ("/users", {})),
+    Scenario("GET", "/metrics", lambda ctx, rng: ("/metrics", {})),
+    _media("GET"),
+    _media("HEAD"),
+    Scenario("POST", "/users/login", _login),
+    Scenario("POST", "/friends", _create_friend),
+    _user_get("/users/{user_id}/friends"),
+    Scenario("POST", "/users/{user_id}/routines/temporary", _save_temporary_routines),
+    _user_get("/users/{user_id}/routines"),
+    Scenario("PUT", "/users/{user_id}/routines/{routine_id}/update_name", _update_routine_name),
+    Scenario("PUT", "/users/{user_id}/routines/{routine_id}/update", _update_routine),
+    Scenario("GET", "/exercises", lambda ctx, rng: ("/exercises", {})),
+    Scenario("GET", "/exercises/search", _exercise_search),
+    _user_get("/users/{user_id}/profile"),
+    _user_get("/users/{user_id}/records"),
+    Scenario("POST", "/users/{user_id}/records", _create_record),
+    _user_get("/users/{user_id}/records/calendar", _calendar_params),
+    _save_photo("/users/{user_id}/own_photos"),
+    _photo_upload("/users/{user_id}/own_photos/upload"),
+    _user_get("/users/{user_id}/own_photos"),
+    Scenario("POST", "/users/{user_id}/social/upload", _social_upload),
+    _user_get("/users/{user_id}/social/photos", lambda rng: {"limit": 20}),
+    _save_photo("/users/{user_id}/meal_photos"),
+    _photo_upload("/users/{user_id}/meal_photos/upload"),
+    _user_get("/users/{user_id}/meal_photos", _meal_photo_params),
+    Scenario("POST", "/users/{user_id}/body_metrics", _create_body_metrics),
+    _user_get("/users/{user_id}/body_metrics", lambda rng: rng.choice([{}, {"points": 200}, {"resolution": "week"}, {"resolution": "month"}])),
+]
+
+
+# 응답이 끝나지 않는 라우트 (SSE 스트림) - 지연 시간 측정 대상이 아님
+UNBENCHMARKED_ROUTES = {("GET", "/users/{user_id}/social/stream")}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    nearest-rank 백분위수
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def uncovered_routes(app) -> List[str]:
+    """
+    main.py 에 있지만 시나리오가 없는 라우트 (라우트를 추가하면 여기에 나타남)
+    """
+    covered = {(scenario.method, scenario.path) for scenario in SCENARIOS} | UNBENCHMARKED_ROUTES
+    missing = []
+    for route in app.routes:
+        methods = getattr(route, "methods", None) or set()
+        if not hasattr(route, "endpoint") or route.path in ("/openapi.json", "/docs", "/docs/oauth2-redirect", "/redoc"):
+            continue
+        for method in sorted(methods):
+            if (method, route.path) not in covered:
+                missing.append(f"{method} {route.path}")
+    return missing
+
+
+def _attach_sql_counter(engines):
+    from sqlalchemy import event
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter = _sql_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for bind in engines:
+        event.listen(bind, "before_cursor_execute", count_statement)
+
+
+async def _measure(client, ctx: BenchContext, scenario: Scenario, total: int, concurrency: int, rng: random.Random) -> dict:
+    latencies: List[float] = []
+    statements: List[int] = []
+    statuses: Counter = Counter()
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < total:
+            issued += 1
+            url, kwargs = scenario.build(ctx, rng)
+            counter = [0]
+            token = _sql_counter.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, url, **{k: v for k, v in kwargs.items() if v is not None})
+                statuses[str(response.status_code)] += 1
+                if response.status_code >= 500:
+                    errors += 1
+            except Exception as e:  # 앱 예외도 결과에 기록하고 계속 진행
+                statuses[type(e).__name__] += 1
+                errors += 1
+            finally:
+                latencies.append((time.perf_counter() - started) * 1000)
+                statements.append(counter[0])
+                _sql_counter.reset(token)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "route": f"{scenario.method} {scenario.path}",
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": dict(statuses),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "sql_per_request": {
+            "mean": round(sum(statements) / len(statements), 2) if statements else 0.0,
+            "max": max(statements, default=0),
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args) -> dict:
+    db_path = configure_environment(args.workdir, args.db_mode)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} does not exist (run `python benchmark.py seed` first)")
+
+    import httpx
+    import database
+    import main
+    from sqlalchemy import func
+    from models import BodyMetrics, Friend, MealPhoto, OwnPhoto, Record, User
+
+    engines = [database.engine, database.read_engine]
+    if database.DB_MODE == "async":
+        engines += [database.async_engine.sync_engine, database.async_read_engine.sync_engine]
+    _attach_sql_counter(engines)
+
+    rng = random.Random(args.seed)
+    db = database.SessionLocal()
+    try:
+        ctx = BenchContext(db, rng)
+        dataset = {model.__tablename__: db.query(func.count()).select_from(model).scalar()
+                   for model in (User, Friend, OwnPhoto, MealPhoto, BodyMetrics, Record)}
+    finally:
+        db.close()
+
+    pattern = re.compile(args.routes) if args.routes else None
+    scenarios = [s for s in SCENARIOS if not pattern or pattern.search(f"{s.method} {s.path}")]
+    if args.read_only:
+        scenarios = [s for s in scenarios if s.method in ("GET", "HEAD")]
+
+    # ASGITransport 는 startup/shutdown 이벤트를 실행하지 않으므로 직접 호출
+    await main.app.router.startup()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in scenarios:
+                if args.warmup:
+                    await _measure(client, ctx, scenario, args.warmup, args.concurrency, rng)
+                result = await _measure(client, ctx, scenario, args.requests, args.concurrency, rng)
+                results.append(result)
+                print(
+                    f"{result['route']:<60} p50={result['latency_ms']['p50']:>8.2f}ms p99={result['latency_ms']['p99']:>8.2f}ms "
+                    f"{result['throughput_rps']:>8.1f} req/s sql={result['sql_per_request']['mean']:.1f} errors={result['errors']}",
+                    file=sys.stderr,
+                )
+    finally:
+        await main.app.router.shutdown()
+        if database.DB_MODE == "async":
+            # aiosqlite 커넥션 스레드가 남아 있으면 프로세스가 종료되지 않음
+            await database.async_engine.dispose()
+            await database.async_read_engine.dispose()
+
+    return {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "db_mode": database.DB_MODE,
+            "database": db_path,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "warmup_per_route": args.warmup,
+            "seed": args.seed,
+            "dataset": dataset,
+        },
+        "routes": results,
+        "uncovered_routes": uncovered_routes(main.app),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic dataset generator and endpoint benchmark for the API.")
+    parser.add_argument("--workdir", default="bench_data", help="directory holding the benchmark app.db and static/uploads")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and request generation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="create a synthetic app.db")
+    seed.add_argument("--users", type=int, default=100)
+    seed.add_argument("--avg-friends", type=int, default=20, help="average friend count (power-law distributed)")
+    seed.add_argument("--rows-per-user", type=int, default=1000, help="own/meal photos, body metrics and records per user")
+    seed.add_argument("--routines-per-user", type=int, default=5)
+    seed.add_argument("--days", type=int, default=730, help="time span of generated photos and records")
+    seed.add_argument("--uploaded-ratio", type=float, default=0.3, help="share of own photos posted to the social tab")
+    seed.add_argument("--blobs", type=int, default=8, help="distinct image files shared by all photos")
+    seed.add_argument("--reset", action="store_true", help="delete an existing benchmark database first")
+
+    run = commands.add_parser("run", help="drive every route and report latency, throughput and SQL counts")
+    run.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    run.add_argument("--warmup", type=int, default=10, help="unmeasured requests per route before measuring")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--routes", help="regex filter on 'METHOD /path', e.g. 'GET .*photos'")
+    run.add_argument("--read-only", action="store_true", help="only GET/HEAD routes (keeps the dataset unchanged)")
+    run.add_argument("--db-mode", choices=["sync", "async"], help="override DB_MODE")
+    run.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_path = os.path.abspath(args.output) if getattr(args, "output", None) else None
+    report = seed_database(args) if args.command == "seed" else asyncio.run(run_benchmark(args))
+    body = json.dumps(report, ensure_ascii=False, indent=2)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
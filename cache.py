@@ -0,0 +1,196 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, NamedTuple, Optional
+from sqlalchemy.orm import Session
+from models import Friend, ExerciseName, User
+
+# 프로세스 내 캐시 모음
+
+
+class FriendGraphCache:
+    """
+    사용자별 친구 ID 목록(인접 리스트) 캐시
+    friends 테이블이 바뀌는 곳(add_friend, delete_friend 등)에서 invalidate 해야 함
+    invalidate 는 같은 프로세스(워커)에만 적용되므로 다른 워커에서 바뀐 관계는 ttl 이 지나면 반영됨
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._adjacency: Dict[int, tuple] = {}  # user_id -> (친구 ID 목록, 만료 시각)
+        self._generations: Dict[int, int] = {}  # user_id -> invalidate 횟수
+        self._epoch = 0  # clear 횟수
+        self._lock = threading.Lock()
+
+    def get_friend_ids(self, db: Session, user_id: int) -> FrozenSet[int]:
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            generation = (self._epoch, self._generations.get(user_id, 0))
+
+        rows = db.query(Friend.friend_id).filter(Friend.user_id == user_id).all()
+        friend_ids = frozenset(row.friend_id for row in rows)
+        with self._lock:
+            # 조회하는 동안 invalidate 됐으면 변경 전 목록일 수 있으므로 저장하지 않음
+            if generation == (self._epoch, self._generations.get(user_id, 0)):
+                self._adjacency[user_id] = (friend_ids, time.monotonic() + self.ttl)
+        return friend_ids
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._adjacency.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._adjacency.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+
+
+class CatalogSnapshot(NamedTuple):
+    version: int
+    etag: str
+    body: bytes  # 미리 직렬화된 JSON
+
+
+class ExerciseCatalogCache:
+    """
+    운동 목록(exercise_names) 전체를 JSON으로 미리 직렬화해 둔 스냅샷
+    내용이 바뀔 때만 version이 올라가고 ETag(내용 해시)도 바뀜
+    """
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_fresh(self) -> Optional[CatalogSnapshot]:
+        """
+        DB 조회 없이 사용할 수 있는 스냅샷 (없거나 오래됐으면 None)
+        """
+        if self._snapshot is None or time.monotonic() - self._built_at > self.refresh_interval:
+            return None
+        return self._snapshot
+
+    def build(self, db: Session) -> CatalogSnapshot:
+        from search import exercise_index
+
+        exercises = db.query(ExerciseName).order_by(ExerciseName.id).all()
+        body = json.dumps(
+            [
+                {
+                    "id": exercise.id,
+                    "name": exercise.name,
+                    "target_area": exercise.target_area,
+                }
+                for exercise in exercises
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        with self._lock:
+            previous = self._snapshot
+            if previous is not None and previous.etag == etag:
+                snapshot = previous
+            else:
+                snapshot = CatalogSnapshot((previous.version + 1) if previous else 1, etag, body)
+                if previous is not None:
+                    exercise_index.invalidate()  # 카탈로그가 바뀌면 검색 인덱스도 다시 생성
+            self._snapshot = snapshot
+            self._built_at = time.monotonic()
+        return snapshot
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        return self.get_fresh() or self.build(db)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = 0.0
+
+
+class CachedUser(NamedTuple):
+    id: int
+    kakao_id: str
+    nickname: Optional[str]
+    profile_image: Optional[str]
+
+
+class UserCache:
+    """
+    사용자 행 TTL LRU 캐시 - 사용자 존재 확인/프로필 조회 시 users 테이블 조회를 생략하기 위함
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_cached(self, user_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user: CachedUser):
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, db: Session, user_id: int) -> Optional[CachedUser]:
+        """
+        캐시에 없으면 DB에서 조회 (없는 사용자는 캐시하지 않음)
+        """
+        user = self.get_cached(user_id)
+        if user is not None:
+            return user
+        row = db.query(User.id, User.kakao_id, User.nickname, User.profile_image).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.kakao_id, row.nickname, row.profile_image)
+        self.put(user)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match 헤더 값이 현재 ETag와 일치하는지 확인 (여러 값, *, W/ 접두어 허용)
+    """
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+def collection_etag(collection: str, version: int, variant: str = "") -> str:
+    """
+    사용자 컬렉션 버전으로 만든 ETag (같은 컬렉션이라도 응답 형태(variant)가 다르면 다른 ETag)
+    """
+    suffix = f"-{hashlib.sha1(variant.encode()).hexdigest()[:8]}" if variant else ""
+    return f'"{collection}-v{version}{suffix}"'
+
+
+friend_graph = FriendGraphCache()
+exercise_catalog = ExerciseCatalogCache()
+user_cache = UserCache()
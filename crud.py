@@ -1,13 +1,27 @@
+from sqlalchemy import Integer, exists, func, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from models import User, Friend, Routine, ExerciseName, Record, MealPhoto, OwnPhoto, BodyMetrics
+from models import User, Friend, Routine, Record, MealPhoto, OwnPhoto, BodyMetrics, PhotoBlob, BodyMetricsRollup, UserStats, TimelineEntry, CollectionVersion
 from typing import Optional, List
-from schemas import RoutineCreate, UserLoginRequest, BodyMetricsCreate, RoutineUpdateRequest, ExerciseUpdateRequest
-from datetime import datetime
+from schemas import RoutineCreate, UserLoginRequest, BodyMetricsCreate, RecordCreate, RoutineUpdateRequest, ExerciseUpdateRequest, OwnPhotoResponse
+from datetime import datetime, date, time, timedelta
 from fastapi import HTTPException
+from pagination import decode_cursor
+from cache import CachedUser, friend_graph, user_cache
+from live_feed import feed_hub
+from search import exercise_index
+from uploads import blob_digest
+from rollups import ROLLUP_METRICS, ROLLUP_RESOLUTIONS, apply_metrics, compute_rollups, lttb, period_start, rollup_to_dict
 import base64
+import logging
 import re
 import os
 
+logger = logging.getLogger(__name__)
+
+# 소셜 피드 fan-out 기준 - 친구가 이보다 많은 사용자의 사진은 친구들 피드에 복사하지 않고 조회 시점에 가져옴
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", "1000"))
+
 def manage_user_in_db(db: Session, user: UserLoginRequest):
 
     # 기존 유저 확인
@@ -45,8 +59,27 @@ def manage_user_in_db(db: Session, user: UserLoginRequest):
         },
     }
 
+# 사용자 컬렉션 버전 올리기 - 컬렉션을 바꾸는 쓰기와 같은 트랜잭션에서 호출 (커밋은 호출한 쪽에서)
+def bump_collection_version(db: Session, user_id: int, collection: str):
+    table = CollectionVersion.__table__
+    db.execute(
+        _dialect_insert(db, table)
+        .values(user_id=user_id, collection=collection, version=1)
+        .on_conflict_do_update(index_elements=["user_id", "collection"], set_={"version": table.c.version + 1})
+    )
+
+# 사용자 컬렉션 현재 버전 (한 번도 바뀌지 않았으면 0) - 기본키 조회 한 번
+def get_collection_version(db: Session, user_id: int, collection: str) -> int:
+    row = db.get(CollectionVersion, (user_id, collection))
+    return row.version if row else 0
+
 #friend 테이블 관련 crud 정리
 
+# 친구 관계가 바뀐 뒤 호출 - 친구 그래프 캐시 무효화, 실시간 피드 구독 대상 갱신 (다른 워커 포함)
+def friends_changed(*user_ids: int):
+    friend_graph.invalidate(*user_ids)
+    feed_hub.publish_friends_changed(*user_ids)
+
 def add_friend(db: Session, scanned_user_id: int, qr_user_id: int):
     # 1. 자기 자신 추가 방지
     if scanned_user_id == qr_user_id:
@@ -66,9 +99,20 @@ def add_friend(db: Session, scanned_user_id: int, qr_user_id: int):
     new_friend_2 = Friend(user_id=qr_user_id, friend_id=scanned_user_id)
     db.add(new_friend_1)
     db.add(new_friend_2)
+
+    # 4. 친구 수 갱신, 서로의 피드에 상대방이 올린 사진 채우기
+    for stats_user_id in (scanned_user_id, qr_user_id):
+        stats = get_or_create_user_stats(db, stats_user_id)
+        stats.friend_count += 1
+    db.flush()
+    backfill_timeline(db, scanned_user_id, qr_user_id)
+    backfill_timeline(db, qr_user_id, scanned_user_id)
+    bump_collection_version(db, scanned_user_id, "friends")
+    bump_collection_version(db, qr_user_id, "friends")
     db.commit()
     db.refresh(new_friend_1)
     db.refresh(new_friend_2)
+    friends_changed(scanned_user_id, qr_user_id)
 
     return {"message": "Friendship created successfully."}
 
@@ -81,6 +125,26 @@ def get_friends_by_user_id(db: Session, user_id: int):
     return friends
 
 
+def get_feed_author_ids(db: Session, user_id: int) -> set:
+    """
+    소셜 피드에 사진이 보이는 사용자 ID (본인 + 친구)
+    """
+    return set(friend_graph.get_friend_ids(db, user_id)) | {user_id}
+
+
+def get_friend_users(db: Session, user_id: int) -> List[User]:
+    """
+    특정 사용자의 친구 User 목록을 한 번의 조인 쿼리로 조회
+    """
+    friends = (
+        db.query(Friend)
+        .options(joinedload(Friend.friend))
+        .filter(Friend.user_id == user_id)
+        .all()
+    )
+    return [friend.friend for friend in friends if friend.friend]
+
+
 def update_friend(db: Session, friend_id: int, user_id: int, new_friend_id: int):
     """
     친구 정보 업데이트 (예: 기존 친구 관계를 다른 사용자로 변경)
@@ -92,8 +156,13 @@ def update_friend(db: Session, friend_id: int, user_id: int, new_friend_id: int)
 
     # 업데이트 (기존 friend_id -> new_friend_id)
     friend_relationship.friend_id = new_friend_id
+    db.flush()
+    prune_timeline(db, user_id, friend_id)
+    backfill_timeline(db, user_id, new_friend_id)
+    bump_collection_version(db, user_id, "friends")
     db.commit()
     db.refresh(friend_relationship)
+    friends_changed(user_id)
 
     return friend_relationship
 
@@ -107,82 +176,130 @@ def delete_friend(db: Session, user_id: int, friend_id: int):
     if not friend_relationship:
         raise HTTPException(status_code=404, detail="Friendship not found.")
 
-    # 친구 관계 삭제
+    # 친구 관계 삭제 - 내 피드에서 그 친구 사진도 정리
     db.delete(friend_relationship)
+    prune_timeline(db, user_id, friend_id)
+
+    # 친구 수가 fan-out 기준 이하로 내려오면 그동안 조회 시점에 가져오던 사진들을 친구 피드에 채움
+    stats = get_or_create_user_stats(db, user_id)
+    stats.friend_count = max(stats.friend_count - 1, 0)
+    if stats.friend_count == FEED_FANOUT_LIMIT:
+        db.flush()
+        fan_out_author_photos(db, user_id)
+    bump_collection_version(db, user_id, "friends")
     db.commit()
+    friends_changed(user_id, friend_id)
 
     return {"message": "Friend deleted successfully"}
 
+# 방언별 INSERT ... ON CONFLICT 구문 (SQLite / PostgreSQL)
+def _dialect_insert(db: Session, table):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
 # 루틴 생성 - 선택한 운동들 임시 저장
+# 동일한 user_id와 exercise_id, routine_id로 저장된 루틴은 건너뛰고 나머지를 한 번의 INSERT로 추가
 def save_temporary_routines_in_db(db: Session, routines: List[RoutineCreate]):
-    for routine in routines:
-        # 동일한 user_id와 exercise_id, routine_id로 저장된 루틴이 없으면 추가
-        existing_routine = db.query(Routine).filter(
-            Routine.user_id == routine.user_id,
-            Routine.exercise_id == routine.exercise_id,
-            Routine.routine_id == routine.routine_id
-        ).first()
-
-        if not existing_routine:
-            new_routine = Routine(
-                routine_id=routine.routine_id,
-                user_id=routine.user_id,
-                exercise_id=routine.exercise_id,
-                sets=routine.sets,
-                reps=routine.reps,
-            )
-            db.add(new_routine)
-    
-    db.commit()
-
-# 루틴 이름을 업데이트하는 함수
-def update_routine_name_in_db(db: Session, user_id: int, routine_name: str):
-    # user_id와 동일한 routine_id를 가진 모든 루틴을 가져옵니다.
-    routines = db.query(Routine).filter(Routine.user_id == user_id).all()
-
-    # 루틴이 없다면 False 반환
     if not routines:
-        print("Debug: No routines found to update.")
-        return False
+        return
 
-    # 루틴 이름 업데이트
-    for routine in routines:
-        # 동일한 routine_id를 가진 루틴이 있으면 routine_name을 동일하게 업데이트
-        routine.routine_name = routine_name
+    statement = _dialect_insert(db, Routine.__table__).values([
+        {
+            "routine_id": routine.routine_id,
+            "user_id": routine.user_id,
+            "exercise_id": routine.exercise_id,
+            "sets": routine.sets,
+            "reps": routine.reps,
+        }
+        for routine in routines
+    ]).on_conflict_do_nothing(index_elements=["user_id", "exercise_id", "routine_id"])
+
+    db.execute(statement)
+    db.commit()
 
+# 루틴 이름을 업데이트하는 함수 - 해당 routine_id 의 행들만 한 번의 UPDATE로 변경
+def update_routine_name_in_db(db: Session, user_id: int, routine_id: int, routine_name: str):
+    result = db.execute(
+        update(Routine)
+        .where(Routine.user_id == user_id, Routine.routine_id == routine_id)
+        .values(routine_name=routine_name)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
-    print("Debug: Routines updated successfully.")
-    return True
+
+    # 변경된 루틴이 없다면 False 반환
+    return result.rowcount > 0
 
 # 특정 사용자의 루틴 이름, 운동 별 세트, 횟수 수정
+# 대상 행을 한 번에 조회 -> 기본키 기준 일괄 UPDATE -> 한 번만 커밋 (중간 실패 시 전체 롤백)
 def update_routine_details_and_name(
     db: Session, user_id: int, routine_id: int, routine_name: Optional[str], exercises: List[ExerciseUpdateRequest]
-) -> List[Routine]:
+) -> List[dict]:
+    exercise_ids = [exercise.exercise_id for exercise in exercises]
+    routines = db.query(Routine.id, Routine.exercise_id, Routine.routine_name).filter(
+        Routine.user_id == user_id,
+        Routine.routine_id == routine_id,
+        Routine.exercise_id.in_(exercise_ids)
+    ).all()
+    routines_by_exercise = {routine.exercise_id: routine for routine in routines}
+
+    for exercise_id in exercise_ids:
+        if exercise_id not in routines_by_exercise:
+            raise HTTPException(status_code=404, detail=f"Routine not found for Exercise ID {exercise_id}")
+
     updated_routines = []
-    
     for exercise in exercises:
-        routine = db.query(Routine).filter(
-            Routine.id == routine_id,
-            Routine.user_id == user_id,
-            Routine.exercise_id == exercise.exercise_id
-        ).first()
-
-        if not routine:
-            raise HTTPException(status_code=404, detail=f"Routine not found for Exercise ID {exercise.exercise_id}")
+        routine = routines_by_exercise[exercise.exercise_id]
+        updated_routines.append({
+            "id": routine.id,
+            "user_id": user_id,
+            # 루틴 이름 수정 (필요시)
+            "routine_name": routine_name or routine.routine_name,
+            # 세트 수와 반복 횟수 수정
+            "sets": exercise.sets,
+            "reps": exercise.reps,
+        })
+
+    if updated_routines:
+        db.execute(
+            update(Routine),
+            [
+                {"id": row["id"], "routine_name": row["routine_name"], "sets": row["sets"], "reps": row["reps"]}
+                for row in updated_routines
+            ],
+        )
+        db.commit()
 
-        # 세트 수와 반복 횟수 수정
-        routine.sets = exercise.sets
-        routine.reps = exercise.reps
+    return updated_routines
 
-        # 루틴 이름 수정 (필요시)
-        if routine_name:
-            routine.routine_name = routine_name
+# 사용자의 루틴 전체 조회 - 운동 정보를 조인해서 한 번에 가져온 뒤 routine_id 별로 묶어서 반환
+def get_routines_by_user(db: Session, user_id: int):
 
-        db.commit()
-        db.refresh(routine)
-        updated_routines.append(routine)
+    routines = db.query(Routine).options(joinedload(Routine.exercise)).filter(
+        Routine.user_id == user_id
+    ).order_by(Routine.routine_id, Routine.id).all()
 
-    return updated_routines
+    grouped = {}
+    for routine in routines:
+        group = grouped.setdefault(routine.routine_id, {
+            "routine_id": routine.routine_id,
+            "routine_name": routine.routine_name,
+            "exercises": [],
+        })
+        group["routine_name"] = group["routine_name"] or routine.routine_name
+        group["exercises"].append({
+            "id": routine.id,
+            "exercise_id": routine.exercise_id,
+            "exercise_name": routine.exercise.name if routine.exercise else "Unknown Exercise",
+            "target_area": routine.exercise.target_area if routine.exercise else None,
+            "sets": routine.sets,
+            "reps": routine.reps,
+        })
+
+    return list(grouped.values())
 
 # # 루틴 가져오는 용 - 루틴 이름으로 조회
 # def get_routines_by_name_in_db(db: Session, user_id: int, routine_name: str):
@@ -204,36 +321,122 @@ def update_routine_details_and_name(
 #         for routine in routines
 #     ]
 
-# 운동 데이터 전체 조회
-def get_all_exercises(db : Session):
-    return db.query(ExerciseName).all()
-
-# 운동 이름으로 운동 조회하기
-def search_exercises_by_name(db : Session, query: str):
-    return db.query(ExerciseName).filter(ExerciseName.name.contains(query)).all()
+# 운동 이름으로 운동 조회하기 - 메모리 검색 인덱스 사용 (부분 일치, 초성 검색, 접두어 우선)
+def search_exercises_by_name(db : Session, query: str, limit: int = 20):
+    return exercise_index.search(db, query, limit)
 
-# 프로필, 운동 완료 일수 반환
-def get_user_profile(db: Session, user_id: int):
-    user = db.query(User).filter(User.id == user_id).first()
+# 프로필, 운동 완료 일수 반환 - 통계는 user_stats 에 미리 집계되어 있어 기본키 조회 한 번으로 끝남
+# 토큰으로 확인된 사용자(user)가 넘어오면 users 테이블은 조회하지 않음
+def get_user_profile(db: Session, user_id: int, user: Optional[CachedUser] = None):
+    user = user or user_cache.get(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    stats = db.get(UserStats, user.id)
+    stats = stats or UserStats(user_id=user.id, completed_days=0, current_streak=0, longest_streak=0, own_photo_count=0, meal_photo_count=0)
 
-    # 운동 완료 일수 계산 (Record 테이블 기준)
-    completed_days = db.query(Record).filter(Record.user_id == user_id).count()
+    # 마지막 운동이 어제보다 전이면 연속 기록은 끊긴 것
+    current_streak = stats.current_streak
+    if not stats.last_workout_date or stats.last_workout_date < date.today() - timedelta(days=1):
+        current_streak = 0
 
     return {
         "user_id": user.id,  # 사용자 ID 추가
         "nickname": user.nickname,
         "profile_image": user.profile_image,
-        "completed_days": completed_days,
+        "completed_days": stats.completed_days,
+        "current_streak": current_streak,
+        "longest_streak": stats.longest_streak,
+        "last_workout_date": stats.last_workout_date,
+        "own_photo_count": stats.own_photo_count,
+        "meal_photo_count": stats.meal_photo_count,
     }
 
+# 사용자 통계 행 조회 (없으면 생성) - 쓰기 트랜잭션 안에서 사용
+def get_or_create_user_stats(db: Session, user_id: int) -> UserStats:
+    stats = db.get(UserStats, user_id)
+    if not stats:
+        stats = UserStats(user_id=user_id, completed_days=0, current_streak=0, longest_streak=0, own_photo_count=0, meal_photo_count=0, friend_count=0)
+        db.add(stats)
+    return stats
+
+# 사용자 통계를 원본 테이블로 다시 계산 (백필, 과거 날짜 기록 추가 시)
+def rebuild_user_stats(db: Session, user_id: int) -> UserStats:
+    stats = get_or_create_user_stats(db, user_id)
+    workout_days = sorted({row.datetime.date() for row in db.query(Record.datetime).filter(Record.user_id == user_id)})
+
+    longest, current = 0, 0
+    for index, day in enumerate(workout_days):
+        current = current + 1 if index and day - workout_days[index - 1] == timedelta(days=1) else 1
+        longest = max(longest, current)
+
+    stats.completed_days = len(workout_days)
+    stats.current_streak = current
+    stats.longest_streak = longest
+    stats.last_workout_date = workout_days[-1] if workout_days else None
+    stats.own_photo_count = db.query(OwnPhoto).filter(OwnPhoto.user_id == user_id).count()
+    stats.meal_photo_count = db.query(MealPhoto).filter(MealPhoto.user_id == user_id).count()
+    stats.friend_count = db.query(Friend).filter(Friend.user_id == user_id).count()
+    return stats
+
+# 통계 행이 없는 사용자들의 통계 생성 (서버 시작 시 호출)
+def backfill_user_stats(db: Session):
+    missing_users = db.query(User.id).filter(~User.id.in_(db.query(UserStats.user_id))).all()
+    for row in missing_users:
+        try:
+            rebuild_user_stats(db, row.id)
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # 다른 워커가 먼저 백필한 경우
+
+    # friend_count 컬럼이 나중에 추가된 DB 의 비어 있는 통계 행 채우기 (이후로는 NULL 이 생기지 않음)
+    db.query(UserStats).filter(UserStats.friend_count.is_(None)).update(
+        {UserStats.friend_count: select(func.count(Friend.id)).where(Friend.user_id == UserStats.user_id).scalar_subquery()},
+        synchronize_session=False,
+    )
+    db.commit()
+
+# 운동 기록 저장 - 운동 일수/연속 기록 통계도 함께 갱신
+def create_record(db: Session, user_id: int, record_data: RecordCreate, user: Optional[CachedUser] = None) -> Record:
+
+    # 없는 사용자의 통계 행이 생기지 않도록 먼저 확인 (토큰으로 확인됐거나 캐시에 있으면 조회 생략)
+    if not (user or user_cache.get(db, user_id)):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    record = Record(
+        user_id=user_id,
+        datetime=record_data.record_datetime or datetime.now(),
+        weight=record_data.weight,
+        body_fat=record_data.body_fat,
+        muscle_mass=record_data.muscle_mass,
+    )
+    day = record.datetime.date()
+
+    stats = get_or_create_user_stats(db, user_id)
+    last_day = stats.last_workout_date
+    if last_day is None or day > last_day:
+        stats.current_streak = stats.current_streak + 1 if last_day == day - timedelta(days=1) else 1
+        stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+        stats.last_workout_date = day
+        stats.completed_days += 1
+        db.add(record)
+    elif day < last_day:
+        # 과거 날짜 기록은 연속 기록이 바뀔 수 있어서 전체 다시 계산
+        db.add(record)
+        db.flush()
+        rebuild_user_stats(db, user_id)
+    else:
+        db.add(record)  # 같은 날 추가 기록 - 운동 일수는 그대로
+
+    bump_collection_version(db, user_id, "records")
+    db.commit()
+    db.refresh(record)
+    return record
 
 # 운동 완료 날짜를 캘린더에 표시하기 - 사용자의 운동 기록 데이터 날짜 별로 가져오기 / postman 확인 완료료
-def get_user_records(db: Session, user_id: int):
+def get_user_records(db: Session, user_id: int, user: Optional[CachedUser] = None):
 
-    # 사용자 존재 여부 확인
-    user_exists = db.query(User).filter(User.id == user_id).first()
+    # 사용자 존재 여부 확인 (토큰으로 확인됐거나 캐시에 있으면 조회 생략)
+    user_exists = user or user_cache.get(db, user_id)
     if not user_exists:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -253,10 +456,56 @@ def get_user_records(db: Session, user_id: int):
         for record in records
     ]
 
+# 운동 완료 캘린더 - 월 범위의 기록 날짜만 인덱스로 조회해서 월별 날짜 비트맵으로 반환
+# bitmap 의 (day - 1) 번째 비트가 1이면 그 날 운동 기록이 있음
+def get_user_calendar(db: Session, user_id: int, from_month: date, to_month: date):
+
+    end = date(to_month.year + to_month.month // 12, to_month.month % 12 + 1, 1)
+    rows = db.query(Record.datetime).filter(
+        Record.user_id == user_id,
+        Record.datetime >= datetime.combine(from_month, time.min),
+        Record.datetime < datetime.combine(end, time.min),
+    ).all()
+
+    bitmaps = {}
+    for row in rows:
+        key = (row.datetime.year, row.datetime.month)
+        bitmaps[key] = bitmaps.get(key, 0) | (1 << (row.datetime.day - 1))
+
+    months = []
+    year, month = from_month.year, from_month.month
+    while (year, month) <= (to_month.year, to_month.month):
+        bitmap = bitmaps.get((year, month), 0)
+        months.append({
+            "month": f"{year:04d}-{month:02d}",
+            "bitmap": bitmap,
+            "days": [day + 1 for day in range(31) if bitmap >> day & 1],
+        })
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return {"user_id": user_id, "months": months}
+
+# 업로드 파일(내용 주소 파일) 참조 수 증가 - 사진 행 저장과 같은 트랜잭션에서 호출
+def add_blob_reference(db: Session, photo_path: str):
+
+    digest = blob_digest(photo_path)
+    if not digest:
+        return
+    updated = db.query(PhotoBlob).filter(PhotoBlob.sha256 == digest).update(
+        {PhotoBlob.ref_count: PhotoBlob.ref_count + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(PhotoBlob(sha256=digest, path=photo_path, ref_count=1, created_at=datetime.now()))
+        db.flush()
+
+    # photo_blobs 쓰기 잠금을 잡은 뒤 확인 - GC 가 먼저 파일을 지웠으면 없는 파일을 가리키는 사진을 저장하지 않음
+    if not os.path.exists(photo_path):
+        raise HTTPException(status_code=409, detail="Uploaded file is no longer available. Please upload it again.")
+
 # 오운완 사진 DB 저장 
 def save_own_photo(db: Session, user_id: int, photo_path: str):
 
-    print(f"Saving photo for user_id={user_id}, photo_path={photo_path}")
+    logger.debug("Saving photo for user_id=%s, photo_path=%s", user_id, photo_path)
     new_photo = OwnPhoto(
         user_id=user_id,
         photo_path=photo_path,
@@ -264,38 +513,164 @@ def save_own_photo(db: Session, user_id: int, photo_path: str):
         is_uploaded=False  # 기본적으로 소셜탭에 업로드되지 않은 상태
     )
     db.add(new_photo)
+    add_blob_reference(db, photo_path)
+    get_or_create_user_stats(db, user_id).own_photo_count += 1
+    bump_collection_version(db, user_id, "own_photos")
     db.commit()
     db.refresh(new_photo)
     return new_photo
 
+# 목록 응답에 필요한 컬럼만 조회 (ORM 객체 생성 없이 Row 튜플로 반환)
+OWN_PHOTO_COLUMNS = (
+    OwnPhoto.id, OwnPhoto.user_id, OwnPhoto.datetime, OwnPhoto.photo_path,
+    OwnPhoto.is_uploaded, OwnPhoto.thumbnail_path, OwnPhoto.medium_path,
+)
+MEAL_PHOTO_COLUMNS = (
+    MealPhoto.id, MealPhoto.user_id, MealPhoto.datetime, MealPhoto.photo_path,
+    MealPhoto.thumbnail_path, MealPhoto.medium_path,
+)
+BODY_METRICS_COLUMNS = (
+    BodyMetrics.id, BodyMetrics.user_id, BodyMetrics.record_date,
+    BodyMetrics.weight, BodyMetrics.muscle_mass, BodyMetrics.body_fat_percentage,
+)
+
 # 내 오운완 사진 전체 조회 - postman 확인 완료
 def get_own_photos_by_user(db: Session, user_id: int):
 
-    return db.query(OwnPhoto).filter(OwnPhoto.user_id == user_id).all()
+    return db.query(*OWN_PHOTO_COLUMNS).filter(OwnPhoto.user_id == user_id).all()
+
+# --- 소셜 피드 (timeline_entries) ---
+# 사진을 소셜탭에 올릴 때 올린 사람과 그 사람을 친구로 둔 사용자들의 피드에 미리 넣어 두고(fan-out-on-write),
+# 피드 조회는 사용자 한 명의 timeline_entries 범위 스캔으로 처리
+# 친구 수가 FEED_FANOUT_LIMIT 를 넘는 사용자의 사진은 복사하지 않고 조회 시점에 가져옴 (예전 방식)
+
+TIMELINE_COLUMNS = ["user_id", "photo_id", "author_id", "datetime"]
 
-# 소셜탭에 오운완 사진 업로드 하기
+# 피드 항목 추가 - (피드 주인, 사진 ID, 올린 사람, 사진 시간)을 반환하는 SELECT 결과를 한 번의 INSERT로 추가 (이미 있으면 건너뜀)
+def _add_timeline_entries(db: Session, entries_select):
+    db.execute(_dialect_insert(db, TimelineEntry.__table__).from_select(TIMELINE_COLUMNS, entries_select).on_conflict_do_nothing())
+
+# 친구 피드에 사진을 복사하는 사용자인지 (친구 수가 기준 이하)
+def is_fanout_author(db: Session, user_id: int) -> bool:
+    return get_or_create_user_stats(db, user_id).friend_count <= FEED_FANOUT_LIMIT
+
+# 새로 소셜탭에 올린 사진을 본인 피드 + 친구들 피드에 추가
+def fan_out_photo(db: Session, photo: OwnPhoto):
+    readers = [
+        select(OwnPhoto.user_id, OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime).where(OwnPhoto.id == photo.id)
+    ]
+    if is_fanout_author(db, photo.user_id):
+        readers.append(
+            select(Friend.user_id, OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime)
+            .join(Friend, Friend.friend_id == OwnPhoto.user_id)
+            .where(OwnPhoto.id == photo.id)
+        )
+    _add_timeline_entries(db, union_all(*readers) if len(readers) > 1 else readers[0])
+
+# 사용자가 지금까지 소셜탭에 올린 사진 전체를 친구들 피드에 추가 (fan-out 대상이 되었을 때)
+def fan_out_author_photos(db: Session, author_id: int):
+    _add_timeline_entries(db, (
+        select(Friend.user_id, OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime)
+        .join(Friend, Friend.friend_id == OwnPhoto.user_id)
+        .where(OwnPhoto.user_id == author_id, OwnPhoto.is_uploaded == True)
+    ))
+
+# 친구 추가 시 내 피드에 그 친구가 올린 사진 채우기 (fan-out 하지 않는 친구는 조회 시점에 가져오므로 생략)
+def backfill_timeline(db: Session, user_id: int, author_id: int):
+    if not is_fanout_author(db, author_id):
+        return
+    _add_timeline_entries(db, (
+        select(literal(user_id, Integer), OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime)
+        .where(OwnPhoto.user_id == author_id, OwnPhoto.is_uploaded == True)
+    ))
+
+# 친구 삭제 시 내 피드에서 그 친구 사진 제거
+def prune_timeline(db: Session, user_id: int, author_id: int):
+    db.query(TimelineEntry).filter(
+        TimelineEntry.user_id == user_id, TimelineEntry.author_id == author_id
+    ).delete(synchronize_session=False)
+
+# 피드 테이블이 비어 있으면 기존 업로드 사진으로 전체 피드 생성 (서버 시작 시 호출, 친구 수 백필 이후)
+def backfill_timelines(db: Session):
+    if db.query(exists().where(TimelineEntry.id.isnot(None))).scalar():
+        return
+    _add_timeline_entries(db, union_all(
+        select(OwnPhoto.user_id, OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime)
+        .where(OwnPhoto.is_uploaded == True),
+        select(Friend.user_id, OwnPhoto.id, OwnPhoto.user_id.label("author_id"), OwnPhoto.datetime)
+        .join(Friend, Friend.friend_id == OwnPhoto.user_id)
+        .join(UserStats, UserStats.user_id == OwnPhoto.user_id)
+        .where(OwnPhoto.is_uploaded == True, UserStats.friend_count <= FEED_FANOUT_LIMIT),
+    ))
+    db.commit()
+
+# 소셜탭에 오운완 사진 업로드 하기 - 본인과 친구들 피드에 추가
 def mark_photo_as_uploaded(db: Session, photo_id: int, user_id: int):
 
     photo = db.query(OwnPhoto).filter(OwnPhoto.id == photo_id, OwnPhoto.user_id == user_id).first()
     if not photo:
         return None
+    newly_uploaded = not photo.is_uploaded
     photo.is_uploaded = True  # 업로드 상태로 변경
+    db.flush()
+    fan_out_photo(db, photo)
+    bump_collection_version(db, user_id, "own_photos")
     db.commit()
     db.refresh(photo)
+
+    # 피드 실시간 스트림에 접속 중인 친구들에게 전송
+    if newly_uploaded:
+        feed_hub.publish_photo(photo.user_id, OwnPhotoResponse.model_validate(photo).model_dump(mode="json"))
     return photo
 
-# 소셜탭에서 나랑 친구들이 업로드한 모든 사진 보기
-def get_social_photos(db: Session, user_id: int):
+# 커서 이후(더 오래된) 항목만 조회하는 조건 추가
+def _older_than_cursor(statement, datetime_column, id_column, after):
+    if not after:
+        return statement
+    cursor_dt, cursor_id = after
+    return statement.where(
+        (datetime_column < cursor_dt) |
+        ((datetime_column == cursor_dt) & (id_column < cursor_id))
+    )
+
+# 소셜탭에서 나랑 친구들이 업로드한 사진 보기 - 최신순 키셋 페이지네이션
+# 내 피드(timeline_entries) 범위 스캔 + fan-out 하지 않는(친구가 아주 많은) 친구들의 사진을 한 번의 쿼리로 합쳐서 조회
+def get_social_photos(db: Session, user_id: int, cursor: Optional[str] = None, limit: int = 20):
+    after = decode_cursor(cursor)
 
-    # 내 친구들의 ID 가져오기
-    friends_subquery = db.query(Friend.friend_id).filter(Friend.user_id == user_id).subquery()
+    # 내 피드에 미리 들어간 사진 (내 사진 + 친구 사진)
+    timeline = _older_than_cursor(
+        select(*OWN_PHOTO_COLUMNS).join(TimelineEntry, TimelineEntry.photo_id == OwnPhoto.id).where(TimelineEntry.user_id == user_id),
+        TimelineEntry.datetime, TimelineEntry.photo_id, after,
+    ).order_by(TimelineEntry.datetime.desc(), TimelineEntry.photo_id.desc()).limit(limit)
 
-    # 내 사진 및 친구들의 업로드된 사진 조회
-    photos = db.query(OwnPhoto).filter(
-        (OwnPhoto.user_id == user_id) |  # 내 사진
-        (OwnPhoto.user_id.in_(friends_subquery))  # 친구들의 사진
-    ).filter(OwnPhoto.is_uploaded == True).all()  # 업로드된 사진만 반환
-    return photos
+    # 친구가 FEED_FANOUT_LIMIT 보다 많은 친구들의 업로드된 사진은 예전처럼 조회 시점에 가져옴
+    large_friends = select(Friend.friend_id).join(UserStats, UserStats.user_id == Friend.friend_id).where(
+        Friend.user_id == user_id, UserStats.friend_count > FEED_FANOUT_LIMIT
+    )
+    pulled = _older_than_cursor(
+        select(*OWN_PHOTO_COLUMNS).where(
+            OwnPhoto.is_uploaded == True,
+            OwnPhoto.user_id.in_(large_friends),
+            ~exists().where(TimelineEntry.user_id == user_id, TimelineEntry.photo_id == OwnPhoto.id),  # 이미 피드에 있는 사진 제외
+        ),
+        OwnPhoto.datetime, OwnPhoto.id, after,
+    ).order_by(OwnPhoto.datetime.desc(), OwnPhoto.id.desc()).limit(limit)
+
+    feed = union_all(timeline.subquery().select(), pulled.subquery().select()).subquery()
+    return db.execute(select(feed).order_by(feed.c.datetime.desc(), feed.c.id.desc()).limit(limit)).all()
+
+# 사진 파생 이미지(썸네일, 중간 크기) 경로 저장 - OwnPhoto / MealPhoto 공용
+def save_photo_variants(db: Session, photo_model, photo_id: int, thumbnail_path: str, medium_path: str):
+
+    photo = db.query(photo_model).filter(photo_model.id == photo_id).first()
+    if not photo:
+        return None
+    photo.thumbnail_path = thumbnail_path
+    photo.medium_path = medium_path
+    bump_collection_version(db, photo.user_id, photo_model.__tablename__)
+    db.commit()
+    return photo
 
 # 식단 사진 DB 저장 
 def save_meal_photo(db: Session, user_id: int, photo_path: str):
@@ -306,14 +681,41 @@ def save_meal_photo(db: Session, user_id: int, photo_path: str):
         photo_path=photo_path
     )
     db.add(new_meal_photo)
+    add_blob_reference(db, photo_path)
+    get_or_create_user_stats(db, user_id).meal_photo_count += 1
+    bump_collection_version(db, user_id, "meal_photos")
     db.commit()
     db.refresh(new_meal_photo)
     return new_meal_photo
 
 # 내 식단 사진 전체 조회
-def get_all_meal_photos_by_user(db: Session, user_id: int):
-
-    return db.query(MealPhoto).filter(MealPhoto.user_id == user_id).all()
+# 식단 사진 조회 - from_date ~ to_date(양 끝 포함) 기간을 최신순으로, limit 이 있으면 키셋 커서 페이지네이션
+# (user_id, datetime) 인덱스 범위 스캔만으로 조회/정렬
+def get_meal_photos_by_user(
+    db: Session,
+    user_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    statement = select(*MEAL_PHOTO_COLUMNS).where(MealPhoto.user_id == user_id)
+    if from_date:
+        statement = statement.where(MealPhoto.datetime >= datetime.combine(from_date, time.min))
+    if to_date:
+        statement = statement.where(MealPhoto.datetime < datetime.combine(to_date + timedelta(days=1), time.min))
+    statement = _older_than_cursor(statement, MealPhoto.datetime, MealPhoto.id, decode_cursor(cursor))
+    statement = statement.order_by(MealPhoto.datetime.desc(), MealPhoto.id.desc())
+    if limit:
+        statement = statement.limit(limit)
+    return db.execute(statement).all()
+
+# 식단 사진을 날짜별로 묶기 - 사진 시간은 현지 시각으로 저장되므로 그 날짜 기준 (입력 순서 유지)
+def group_meal_photos_by_day(photos) -> list:
+    days = {}
+    for photo in photos:
+        days.setdefault(photo.datetime.date(), []).append(photo)
+    return [{"date": day, "photos": day_photos} for day, day_photos in days.items()]
 
 # 사용자의 체중 및 골격근량, 체지방률 기록 생성
 def create_body_metrics(db: Session, user_id: int, metrics_data: BodyMetricsCreate) -> BodyMetrics:
@@ -326,10 +728,77 @@ def create_body_metrics(db: Session, user_id: int, metrics_data: BodyMetricsCrea
         body_fat_percentage=metrics_data.body_fat_percentage,
     )
     db.add(body_metrics)
+    update_body_metrics_rollups(db, user_id, body_metrics)
+    bump_collection_version(db, user_id, "body_metrics")
     db.commit()
     db.refresh(body_metrics)  
     return body_metrics
 
 #사용자의 체중 및 골격근량, 체지방률 기록 조회
-def get_user_body_metrics(db: Session, user_id: int) -> list[BodyMetrics]:
-    return db.query(BodyMetrics).filter(BodyMetrics.user_id == user_id).order_by(BodyMetrics.record_date).all()
\ No newline at end of file
+def get_user_body_metrics(db: Session, user_id: int):
+    return db.query(*BODY_METRICS_COLUMNS).filter(BodyMetrics.user_id == user_id).order_by(BodyMetrics.record_date).all()
+
+# 주/월 집계에 새 기록 반영 - 기록 저장과 같은 트랜잭션에서 호출
+def update_body_metrics_rollups(db: Session, user_id: int, metrics: BodyMetrics):
+    for resolution in ROLLUP_RESOLUTIONS:
+        start = period_start(metrics.record_date, resolution)
+        rollup = db.query(BodyMetricsRollup).filter(
+            BodyMetricsRollup.user_id == user_id,
+            BodyMetricsRollup.resolution == resolution,
+            BodyMetricsRollup.period_start == start,
+        ).first()
+        if not rollup:
+            rollup = BodyMetricsRollup(user_id=user_id, resolution=resolution, period_start=start, count=0)
+            db.add(rollup)
+        apply_metrics(rollup, metrics)
+
+# 사용자의 주/월 집계를 원본 기록으로 다시 생성 (기존 데이터 백필용)
+def rebuild_body_metrics_rollups(db: Session, user_id: int):
+    metrics_rows = get_user_body_metrics(db, user_id)
+    db.query(BodyMetricsRollup).filter(BodyMetricsRollup.user_id == user_id).delete(synchronize_session=False)
+    for resolution in ROLLUP_RESOLUTIONS:
+        for computed in compute_rollups(metrics_rows, resolution):
+            rollup = BodyMetricsRollup(user_id=user_id, resolution=resolution, period_start=computed.period_start)
+            for column in BodyMetricsRollup.__table__.columns.keys():
+                if hasattr(computed, column) and column not in ("user_id", "resolution", "period_start"):
+                    setattr(rollup, column, getattr(computed, column))
+            db.add(rollup)
+    db.commit()
+
+# 집계가 아직 없는 사용자들의 집계 생성 (서버 시작 시 호출)
+def backfill_body_metrics_rollups(db: Session):
+    missing_users = db.query(BodyMetrics.user_id).distinct().filter(
+        ~BodyMetrics.user_id.in_(db.query(BodyMetricsRollup.user_id))
+    ).all()
+    for row in missing_users:
+        try:
+            rebuild_body_metrics_rollups(db, row.user_id)
+        except IntegrityError:
+            db.rollback()  # 다른 워커가 먼저 백필한 경우
+
+# 차트용 체중/골격근량/체지방률 조회 - 주/월 집계 또는 LTTB 다운샘플
+def get_body_metrics_chart(db: Session, user_id: int, resolution: Optional[str], points: Optional[int]):
+    if resolution:
+        rollups = db.query(BodyMetricsRollup).filter(
+            BodyMetricsRollup.user_id == user_id,
+            BodyMetricsRollup.resolution == resolution,
+        ).order_by(BodyMetricsRollup.period_start).all()
+        if not rollups:
+            # 아직 백필되지 않은 사용자는 원본 기록으로 바로 계산
+            rollups = compute_rollups(get_user_body_metrics(db, user_id), resolution)
+        if points:
+            rollups = lttb(
+                rollups, points,
+                x=lambda rollup: rollup.period_start.toordinal(),
+                ys=[lambda rollup, name=name: getattr(rollup, f"{name}_sum") / rollup.count for name in ROLLUP_METRICS],
+            )
+        return [rollup_to_dict(rollup) for rollup in rollups]
+
+    records = get_user_body_metrics(db, user_id)
+    if points:
+        records = lttb(
+            records, points,
+            x=lambda record: record.record_date.toordinal(),
+            ys=[lambda record: record.weight, lambda record: record.muscle_mass, lambda record: record.body_fat_percentage],
+        )
+    return records
@@ -1,22 +1,211 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, func, inspect, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"  # SQLite 파일 경로
+# DB 접속 설정 - 환경 변수로 변경 가능
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")  # 기본값: SQLite 파일 경로
+READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")  # 읽기 전용 DB (없으면 같은 DB를 읽기 전용으로 연결)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
 
-# 데이터베이스 엔진 생성
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# DB 접근 방식 선택 - "sync": 스레드풀에서 동기 세션 사용, "async": AsyncSession 사용 (벤치마크 비교용)
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# 비동기 모드에서 사용할 드라이버
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+IS_SQLITE = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "sqlite"
+
+
+def _read_only_url(url: str) -> str:
+    """
+    SQLite 파일 DB를 읽기 전용(mode=ro) URI로 변환
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return url
+    return str(parsed.set(database=f"file:{parsed.database}", query={**parsed.query, "mode": "ro", "uri": "true"}))
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    return str(parsed.set(drivername=driver)) if driver and "+" not in parsed.drivername else url
+
+
+def _engine_kwargs(writer: bool) -> dict:
+    if not IS_SQLITE:
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    if writer:
+        # SQLite는 쓰기가 어차피 직렬화되므로 쓰기 커넥션을 하나만 두고 요청들이 순서대로 사용
+        return {"pool_size": 1, "max_overflow": 0, "pool_timeout": DB_POOL_TIMEOUT}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+
+def _setup_sqlite(sync_engine, writer: bool):
+    """
+    커넥션 생성 시 SQLite pragma 설정 - WAL 모드에서는 읽기와 쓰기가 서로 막지 않음
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if writer:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        else:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+def _create_engine(url: str, writer: bool):
+    connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+    new_engine = create_engine(url, connect_args=connect_args, **_engine_kwargs(writer))
+    if IS_SQLITE:
+        _setup_sqlite(new_engine, writer)
+    return new_engine
+
+
+# 데이터베이스 엔진 생성 - 쓰기용(engine)과 GET 엔드포인트용 읽기 전용(read_engine)
+engine = _create_engine(SQLALCHEMY_DATABASE_URL, writer=True)
+read_engine = _create_engine(READ_DATABASE_URL or _read_only_url(SQLALCHEMY_DATABASE_URL), writer=False)
 
 # 세션 로컬 생성
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Base 클래스 생성
 Base = declarative_base()
 
-# 데이터베이스 세션 제공 함수
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    def _create_async_engine(url: str, writer: bool):
+        # aiosqlite 파일 DB의 기본값은 NullPool이라 풀 크기 설정을 위해 큐 풀을 명시
+        pool_kwargs = {"poolclass": AsyncAdaptedQueuePool} if IS_SQLITE else {}
+        new_engine = create_async_engine(_async_url(url), **pool_kwargs, **_engine_kwargs(writer))
+        if IS_SQLITE:
+            _setup_sqlite(new_engine.sync_engine, writer)
+        return new_engine
+
+    async_engine = _create_async_engine(SQLALCHEMY_DATABASE_URL, writer=True)
+    async_read_engine = _create_async_engine(READ_DATABASE_URL or _read_only_url(SQLALCHEMY_DATABASE_URL), writer=False)
+
+    # 응답 직렬화가 run_sync 밖에서 일어나므로 커밋 후에도 속성을 만료시키지 않음
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+    # 데이터베이스 세션 제공 함수 (비동기, 쓰기용)
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    # 데이터베이스 세션 제공 함수 (비동기, 읽기 전용)
+    async def get_read_db():
+        async with AsyncReadSessionLocal() as db:
+            yield db
+
+    # crud 함수(동기 Session 기반)를 AsyncSession 위에서 실행
+    async def run_db(db: AsyncSession, fn, *args, **kwargs):
+        return await db.run_sync(fn, *args, **kwargs)
+
+else:
+    # 데이터베이스 세션 제공 함수 (쓰기용)
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # 데이터베이스 세션 제공 함수 (읽기 전용)
+    def get_read_db():
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # crud 함수를 스레드풀에서 실행 (이벤트 루프를 막지 않도록)
+    async def run_db(db, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# 계측 등에서 사용할 현재 모드의 모든 엔진 (비동기 모드는 AsyncEngine 포함)
+def all_engines():
+    engines = [engine, read_engine]
+    if DB_MODE == "async":
+        engines += [async_engine, async_read_engine]
+    return engines
+
+# 기존 DB 파일의 테이블에 나중에 추가된 컬럼 생성
+# SQLite 는 기본값 없는 NOT NULL 컬럼을 ALTER 로 추가할 수 없으므로 제약 없이 추가 - 기존 행의 값은 시작 시 백필에서 채움
+# (예: user_stats.friend_count 는 backfill_user_stats)
+def add_missing_columns(bind):
+    with bind.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+# 기존 DB 파일에 나중에 추가된 인덱스 생성 (create_all은 이미 존재하는 테이블의 인덱스는 만들지 않음)
+# 새 유니크 인덱스와 충돌하는 기존 행이 있으면 데이터를 지우지 않고 시작을 중단 (정리는 dedupe_index.py 로 직접 실행)
+def create_missing_indexes(bind):
+    with bind.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            for index in table.indexes:
+                if inspector.has_index(table.name, index.name):
+                    continue
+                if index.unique:
+                    duplicates = find_duplicate_rows(connection, index, limit=DUPLICATE_REPORT_LIMIT)
+                    if duplicates:
+                        raise RuntimeError(_duplicate_rows_message(index, duplicates))
+                index.create(bind=connection)
+
+DUPLICATE_REPORT_LIMIT = 20
+
+# 유니크 인덱스 컬럼 값이 같은 행 묶음 [(컬럼 값, [id, ...]), ...] (id 오름차순)
+# 컬럼 값에 NULL 이 있는 행은 유니크 인덱스에서 서로 충돌하지 않으므로 제외
+def find_duplicate_rows(connection, index, limit=None):
+    table = index.table
+    columns = list(index.expressions)
+    groups = (
+        select(*columns)
+        .where(*(column.is_not(None) for column in columns))
+        .group_by(*columns)
+        .having(func.count() > 1)
+    )
+    if limit:
+        groups = groups.limit(limit)
+
+    duplicates = []
+    for key in connection.execute(groups).all():
+        ids = connection.execute(
+            select(table.c.id).where(*(column == value for column, value in zip(columns, key))).order_by(table.c.id)
+        ).scalars().all()
+        duplicates.append((tuple(key), ids))
+    return duplicates
+
+def _duplicate_rows_message(index, duplicates):
+    columns = ", ".join(column.name for column in index.expressions)
+    groups = "\n".join(f"  ({', '.join(map(str, key))}): ids {ids}" for key, ids in duplicates)
+    more = f" (first {len(duplicates)} groups)" if len(duplicates) == DUPLICATE_REPORT_LIMIT else ""
+    return (
+        f"Cannot create unique index {index.name}: {index.table.name} has rows with the same ({columns}){more}:\n"
+        f"{groups}\n"
+        f"Review them, then run 'python dedupe_index.py {index.name} --apply' to keep the lowest id of each group."
+    )
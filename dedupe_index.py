@@ -0,0 +1,53 @@
+import argparse
+import sys
+from sqlalchemy import delete
+
+import models  # Base.metadata 에 테이블 등록
+from database import Base, engine, find_duplicate_rows
+
+# 새 유니크 인덱스와 충돌하는 기존 중복 행 정리 (한 번만 직접 실행하는 마이그레이션)
+# 서버 시작 시 create_missing_indexes 가 중복을 발견하면 시작을 중단하고 이 스크립트를 안내함
+#
+#   python dedupe_index.py ux_routines_user_exercise_routine           # 중복 행 확인만
+#   python dedupe_index.py ux_routines_user_exercise_routine --apply   # 묶음마다 id 가 가장 작은 행만 남기고 삭제
+
+
+def find_index(name: str):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name == name and index.unique:
+                return index
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove rows that conflict with a unique index before it is created.")
+    parser.add_argument("index", help="unique index name (e.g. ux_routines_user_exercise_routine)")
+    parser.add_argument("--apply", action="store_true", help="delete the duplicates (default: only list them)")
+    args = parser.parse_args()
+
+    index = find_index(args.index)
+    if index is None:
+        sys.exit(f"Unknown unique index: {args.index}")
+
+    table = index.table
+    with engine.begin() as connection:
+        duplicates = find_duplicate_rows(connection, index)
+        if not duplicates:
+            print(f"No rows conflict with {index.name}.")
+            return
+
+        columns = ", ".join(column.name for column in index.expressions)
+        for key, ids in duplicates:
+            print(f"({columns}) = ({', '.join(map(str, key))}): keep id {ids[0]}, remove {ids[1:]}")
+
+        removed_ids = [row_id for _, ids in duplicates for row_id in ids[1:]]
+        if not args.apply:
+            print(f"{len(removed_ids)} rows in {table.name} would be removed. Re-run with --apply to delete them.")
+            return
+        connection.execute(delete(table).where(table.c.id.in_(removed_ids)))
+        print(f"Removed {len(removed_ids)} rows from {table.name}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, Optional, Set
+
+# 소셜 피드 실시간 전달 (SSE) - 사진이 소셜탭에 올라가면 그 사진을 피드에서 보는 접속 중인 사용자에게 바로 전송
+# 워커(프로세스)마다 FeedHub 하나가 접속자 구독을 관리하고, 워커 간 메시지 전달은 백엔드가 담당
+#   FEED_BACKEND_URL 이 없으면 프로세스 내 전달 (워커 1개), redis://... 이면 Redis pub/sub 으로 모든 워커에 전달
+
+logger = logging.getLogger(__name__)
+
+FEED_BACKEND_URL = os.getenv("FEED_BACKEND_URL")
+FEED_CHANNEL = os.getenv("FEED_CHANNEL", "social_feed")
+SUBSCRIBER_QUEUE_SIZE = 100
+FEED_KEEPALIVE_SECONDS = float(os.getenv("FEED_KEEPALIVE_SECONDS", "25"))  # 프록시가 연결을 끊지 않도록 보내는 주석 간격
+
+
+class InMemoryBackend:
+    """
+    같은 프로세스 안에서만 전달 (기본값)
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[dict], None]] = None
+
+    async def start(self, deliver: Callable[[dict], None]):
+        self._deliver = deliver
+
+    async def publish(self, message: dict):
+        if self._deliver:
+            self._deliver(message)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class RedisBackend:
+    """
+    Redis pub/sub 채널 하나로 모든 워커에 전달 (redis 패키지 필요)
+    자기가 보낸 메시지도 채널을 통해 받으므로 전달 경로는 워커 수와 관계없이 같음
+    """
+
+    def __init__(self, url: str, channel: str = FEED_CHANNEL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("FEED_BACKEND_URL requires the 'redis' package (pip install redis)")
+        self.channel = channel
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[dict], None]):
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[dict], None]):
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                deliver(json.loads(message["data"]))
+            except Exception:
+                logger.exception("Failed to deliver feed message")
+
+    async def publish(self, message: dict):
+        await self._redis.publish(self.channel, json.dumps(message, default=str))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        await self._pubsub.unsubscribe(self.channel)
+        await self._pubsub.close()
+        await self._redis.close()
+
+
+def create_backend(url: Optional[str] = FEED_BACKEND_URL):
+    if not url:
+        return InMemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise RuntimeError(f"Unsupported FEED_BACKEND_URL: {url}")
+
+
+def _log_publish_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error("Failed to publish feed message", exc_info=task.exception())
+
+
+class Subscription:
+    """
+    접속 하나 (SSE 스트림) - 피드에 보이는 사용자(본인 + 친구)의 새 사진만 받음
+    """
+
+    def __init__(self, user_id: int, author_ids: Iterable[int]):
+        self.user_id = user_id
+        self.author_ids: Set[int] = set(author_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, message: dict):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 클라이언트가 못 따라오면 쌓인 이벤트를 버리고 피드를 다시 불러오라고 알림
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class FeedHub:
+    """
+    (사진 올린 사람 -> 접속 중인 구독) 인덱스로 새 사진을 해당 구독에만 전달
+    crud(스레드풀/이벤트 루프 어디서든)에서 publish_* 를 호출하면 이벤트 루프에서 백엔드로 전송
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._by_author: Dict[int, Set[Subscription]] = {}
+        self._by_user: Dict[int, Set[Subscription]] = {}
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    async def start(self, backend=None):
+        self._backend = backend or create_backend()
+        self._loop = asyncio.get_running_loop()
+        await self._backend.start(self._deliver)
+
+    async def stop(self):
+        if self._backend:
+            await self._backend.stop()
+        self._loop = None
+
+    # --- 구독 관리 (이벤트 루프에서 호출) ---
+
+    def subscribe(self, user_id: int, author_ids: Iterable[int]) -> Subscription:
+        subscription = Subscription(user_id, author_ids)
+        self._by_user.setdefault(user_id, set()).add(subscription)
+        self._index(subscription)
+        return subscription
+
+    def update_authors(self, subscription: Subscription, author_ids: Iterable[int]):
+        self._unindex(subscription)
+        subscription.author_ids = set(author_ids)
+        self._index(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        self._unindex(subscription)
+        subscribers = self._by_user.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_user[subscription.user_id]
+
+    def _index(self, subscription: Subscription):
+        for author_id in subscription.author_ids:
+            self._by_author.setdefault(author_id, set()).add(subscription)
+
+    def _unindex(self, subscription: Subscription):
+        for author_id in subscription.author_ids:
+            subscribers = self._by_author.get(author_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_author[author_id]
+
+    # --- 발행 (어느 스레드에서든 호출 가능) ---
+
+    def publish_photo(self, author_id: int, photo: dict):
+        self._publish({"type": "photo", "author_id": author_id, "photo": photo})
+
+    def publish_friends_changed(self, *user_ids: int):
+        self._publish({"type": "friends_changed", "user_ids": list(user_ids)})
+
+    def _publish(self, message: dict):
+        if self._loop is None:  # 서버 밖(스크립트, 백필)에서는 전달할 접속자가 없음
+            return
+        self._loop.call_soon_threadsafe(self._send, message)
+
+    def _send(self, message: dict):
+        self._loop.create_task(self._backend.publish(message)).add_done_callback(_log_publish_error)
+
+    # --- 수신 (이벤트 루프에서 백엔드가 호출) ---
+
+    def _deliver(self, message: dict):
+        if message["type"] == "photo":
+            for subscription in list(self._by_author.get(message["author_id"], ())):
+                subscription.put(message)
+        elif message["type"] == "friends_changed":
+            from cache import friend_graph
+
+            # 다른 워커에서 바뀐 친구 관계도 이 워커의 캐시에 반영
+            friend_graph.invalidate(*message["user_ids"])
+            for user_id in message["user_ids"]:
+                for subscription in list(self._by_user.get(user_id, ())):
+                    subscription.put(message)
+
+
+feed_hub = FeedHub()
@@ -1,78 +1,196 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, Header, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import SessionLocal, Base, engine, get_db
-from crud import add_friend,save_temporary_routines_in_db, update_routine_name_in_db, get_all_exercises, search_exercises_by_name, manage_user_in_db, get_user_profile, save_own_photo
-from schemas import RoutineCreate, UserLoginRequest, UserLoginResponse, OwnPhotoResponse, OwnPhotoCreate, PhotoUploadRequest, MealPhotoResponse, MealPhotoCreate,  PhotoUploadResponse, BodyMetricsCreate, BodyMetricsResponse, RoutineUpdateRequest, RoutineResponse, RoutineNameUpdateRequest, RoutineCreateList
-from models import User, Friend, ExerciseName, Routine, MealPhoto, OwnPhoto, Record
-from datetime import datetime
-from typing import Dict,List
+from database import SessionLocal, ReadSessionLocal, Base, engine, get_db, get_read_db, run_db, add_missing_columns, create_missing_indexes, all_engines
+from crud import add_friend,save_temporary_routines_in_db, update_routine_name_in_db, search_exercises_by_name, manage_user_in_db, get_user_profile, save_own_photo
+from schemas import RoutineCreate, UserLoginRequest, UserLoginResponse, OwnPhotoResponse, OwnPhotoCreate, PhotoUploadRequest, MealPhotoResponse, MealPhotoDayResponse, MealPhotoCreate,  PhotoUploadResponse, BodyMetricsCreate, BodyMetricsResponse, BodyMetricsRollupResponse, RecordCreate, RoutineUpdateRequest, RoutineResponse, RoutineDetailResponse, RoutineNameUpdateRequest, RoutineCreateList
+from models import MealPhoto, OwnPhoto
+from datetime import date, datetime, timedelta
+from typing import Dict,List,Optional,Union,Literal
 from collections import defaultdict
+import asyncio
+import json
+from pagination import next_cursor
+from serialization import json_list_response, own_photo_list_adapter, meal_photo_list_adapter, meal_photo_day_list_adapter, body_metrics_list_adapter, body_metrics_rollup_list_adapter
+from auth import authenticate_user, ensure_owner, get_current_user
+from metrics import MetricsMiddleware, instrument_engines
+from cache import CachedUser, collection_etag, etag_matches
 
 app = FastAPI()
 
+# 요청별 지연 시간, SQL 실행 수/DB 시간, 조회 행 수 계측 (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+instrument_engines(*all_engines())
+
 # 테이블 생성
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+create_missing_indexes(engine)
+
+# 서버 시작 시 운동 목록 스냅샷과 검색 인덱스 생성, 체중 기록 집계/사용자 통계/소셜 피드 백필
+@app.on_event("startup")
+def load_startup_data():
+    from cache import exercise_catalog
+    from crud import backfill_body_metrics_rollups, backfill_user_stats, backfill_timelines
+    from search import exercise_index
+
+    db = SessionLocal()
+    try:
+        exercise_catalog.build(db)
+        exercise_index.build(db)
+        backfill_body_metrics_rollups(db)
+        backfill_user_stats(db)
+        backfill_timelines(db)
+    finally:
+        db.close()
+
+# 실시간 소셜 피드 전달 허브 시작 (FEED_BACKEND_URL 이 있으면 워커 간 공유)
+@app.on_event("startup")
+async def start_feed_hub():
+    from live_feed import feed_hub
+
+    await feed_hub.start()
+
+# 서버 종료 시 사진 파생 이미지 프로세스 풀 정리
+@app.on_event("shutdown")
+def stop_variant_pool():
+    from thumbnails import shutdown_pool
+
+    shutdown_pool()
+
+@app.on_event("shutdown")
+async def stop_feed_hub():
+    from live_feed import feed_hub
+
+    await feed_hub.stop()
 
 @app.get("/")
 def read_root():
     return {"message": "Server is running"}
 
+# Prometheus 수집용 지표 (워커 프로세스별 값)
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    from metrics import registry
+
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/users")
 def read_root():
     return {"message": "Server is running"}
 
+# 업로드된 사진 파일 제공 (ETag, Range 지원)
+@app.api_route("/static/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def get_uploaded_media(file_path: str, if_none_match: Optional[str] = Header(None)):
+    from media import serve_media
+
+    return await serve_media(file_path, if_none_match)
+
 @app.post("/users/login", response_model=UserLoginResponse)
-def login(user: UserLoginRequest, db: Session = Depends(get_db)):
-    result = manage_user_in_db(db, user)
+async def login(user: UserLoginRequest, db: Session = Depends(get_db)):
+    from cache import user_cache
+    from utils import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token
+
+    result = await run_db(db, manage_user_in_db, user)
+    logged_in = result["user"]
+    user_cache.put(CachedUser(logged_in["id"], logged_in["kakao_id"], logged_in["nickname"], logged_in["profile_image"]))
+
+    # 이후 요청은 토큰만 검증하면 되도록 사용자 정보를 토큰에 담아 발급
+    access_token = create_access_token(
+        {
+            "sub": str(logged_in["id"]),
+            "kakao_id": logged_in["kakao_id"],
+            "nickname": logged_in["nickname"],
+            "profile_image": logged_in["profile_image"],
+        },
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
     return {
-        "id": result["user"]["id"],  # 수정: id -> user_id
+        "id": logged_in["id"],  # 수정: id -> user_id
         "message": result["message"],
-        "user": result["user"],
+        "user": logged_in,
+        "access_token": access_token,
+        "token_type": "bearer",
     }
 
 # qr 코드로 친구 추가 엔드포인트
 @app.post("/friends")
-def create_friend(data: dict, db: Session = Depends(get_db)):
+async def create_friend(data: dict, db: Session = Depends(get_db), current_user: Optional[CachedUser] = Depends(authenticate_user)):
     # 1. 요청 데이터 검증
     scanned_user_id = data.get("scanned_user_id")
     qr_user_id = data.get("qr_user_id")
     if not scanned_user_id or not qr_user_id:
         raise HTTPException(status_code=400, detail="Both user IDs are required.")
+    if not str(scanned_user_id).isdigit():
+        raise HTTPException(status_code=400, detail="User IDs must be integers.")
+
+    # QR 을 스캔한 사용자 본인만 친구 추가 가능
+    ensure_owner(current_user, int(scanned_user_id))
 
     # 2. CRUD 함수 호출
-    return add_friend(db, scanned_user_id, qr_user_id)  # crud.py의 함수를 호출
+    return await run_db(db, add_friend, scanned_user_id, qr_user_id)  # crud.py의 함수를 호출
+
+# 사용자 컬렉션 조회용 ETag 헤더 - 컬렉션 버전(쓰기마다 증가)만 읽으므로 304 응답에는 목록 조회가 필요 없음
+# 버전을 목록보다 먼저 읽으므로 사이에 쓰기가 끼어도 ETag 가 데이터보다 오래될 뿐 (다음 요청에서 다시 200)
+async def collection_headers(db: Session, user_id: int, collection: str, variant: str = "") -> Dict[str, str]:
+    from crud import get_collection_version
+
+    version = await run_db(db, get_collection_version, user_id, collection)
+    return {"ETag": collection_etag(collection, version, variant), "Cache-Control": "private, no-cache"}
 
 # 개인 friend 목록 볼 수 있는 tab4 의 엔드포인트 정리
 
-@app.get("/users/{user_id}/friends")
-def get_user_friends(user_id: int, db: Session = Depends(get_db)):
+@app.get("/users/{user_id}/friends", dependencies=[Depends(get_current_user)])
+async def get_user_friends(
+    user_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
     """
-    특정 사용자의 친구 목록을 반환합니다.
+    특정 사용자의 친구 목록을 반환합니다. (변경 없으면 304)
     """
-    friends = db.query(Friend).filter(Friend.user_id == user_id).all()
-    friend_list = []
+    from crud import get_friend_users
+
+    headers = await collection_headers(db, user_id, "friends")
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    friends = await run_db(db, get_friend_users, user_id)
     if not friends:
         raise HTTPException(status_code=404, detail="No friends found for the user")
 
     # 친구 목록 데이터를 반환
-    for friend in friends:
-        friend_user = db.query(User).filter(User.id == friend.friend_id).first()
-        if friend_user:
-            friend_list.append({
-                "id": friend_user.id,
-                "nickname": friend_user.nickname,
-                "profile_image": friend_user.profile_image,
-            })
+    friend_list = [
+        {
+            "id": friend_user.id,
+            "nickname": friend_user.nickname,
+            "profile_image": friend_user.profile_image,
+        }
+        for friend_user in friends
+    ]
 
+    response.headers.update(headers)
     return {"friends": friend_list}
 
 # 루틴 생성 - 선택한 운동들 임시 저장 (routine_id 사용)
-@app.post("/users/{user_id}/routines/temporary")
-def save_temporary_routines(user_id: int, routines: RoutineCreateList, db: Session = Depends(get_db)):
+@app.post("/users/{user_id}/routines/temporary", dependencies=[Depends(get_current_user)])
+async def save_temporary_routines(user_id: int, routines: RoutineCreateList, db: Session = Depends(get_db)):
     # 루틴 임시 저장
-    save_temporary_routines_in_db(db, routines.routines)
+    await run_db(db, save_temporary_routines_in_db, routines.routines)
     return {"message": "Temporary routines saved successfully!"}
 
+# 사용자의 루틴 목록 조회 - routine_id 별로 운동 목록을 묶어서 반환
+@app.get("/users/{user_id}/routines", response_model=List[RoutineDetailResponse], dependencies=[Depends(get_current_user)])
+async def get_user_routines(user_id: int, db: Session = Depends(get_read_db)):
+    from crud import get_routines_by_user
+
+    routines = await run_db(db, get_routines_by_user, user_id)
+    if not routines:
+        raise HTTPException(status_code=404, detail="No routines found for the user")
+    return routines
+
 # # 루틴 이름을 업데이트하는 함수
 # @app.put("/users/{user_id}/routines/{routine_id}/name", response_model=RoutineResponse)
 # def update_routine_name(
@@ -92,20 +210,22 @@ def save_temporary_routines(user_id: int, routines: RoutineCreateList, db: Sessi
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=f"Error updating routine name: {str(e)}")
 
-@app.put("/users/{user_id}/routines/{routine_id}/update_name")
-def update_routine_name(user_id: int, routine_id: int, routine_name: str, db: Session = Depends(get_db)):
+@app.put("/users/{user_id}/routines/{routine_id}/update_name", dependencies=[Depends(get_current_user)])
+async def update_routine_name(user_id: int, routine_id: int, routine_name: str, db: Session = Depends(get_db)):
     try:
         # 루틴 이름 업데이트 함수 호출
-        success = update_routine_name_in_db(db, user_id, routine_name)
+        success = await run_db(db, update_routine_name_in_db, user_id, routine_id, routine_name)
         if not success:
             raise HTTPException(status_code=404, detail="No routines found to update.")
         return {"message": f"Routine name updated to '{routine_name}' successfully!"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating routine name: {str(e)}")
 
 # 특정 사용자의 루틴 이름, 운동 별 세트, 횟수 수정
-@app.put("/users/{user_id}/routines/{routine_id}/update", response_model=List[RoutineResponse])
-def update_routine(
+@app.put("/users/{user_id}/routines/{routine_id}/update", response_model=List[RoutineResponse], dependencies=[Depends(get_current_user)])
+async def update_routine(
     user_id: int,
     routine_id: int,
     routine_data: RoutineUpdateRequest,
@@ -115,32 +235,34 @@ def update_routine(
 
     try:
         # 루틴의 세트와 반복 횟수, 그리고 루틴 이름을 수정
-        updated_routines = update_routine_details_and_name(
-            db, user_id, routine_id, routine_data.routine_name, routine_data.exercises
+        updated_routines = await run_db(
+            db, update_routine_details_and_name, user_id, routine_id, routine_data.routine_name, routine_data.exercises
         )
         return updated_routines
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Error updating routine: {str(e)}")
 
-# 전체 운동 목록 반환
+# 전체 운동 목록 반환 - 미리 직렬화된 스냅샷 + ETag (변경 없으면 304)
 @app.get("/exercises")
-def get_all_exercises_list(db: Session = Depends(get_db)):
+async def get_all_exercises_list(
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
+    from cache import exercise_catalog
 
-    exercises = get_all_exercises(db)
-    return [
-        {
-            "id": exercise.id,
-            "name": exercise.name,
-            "target_area": exercise.target_area,
-        }
-        for exercise in exercises
-    ]
+    snapshot = exercise_catalog.get_fresh() or await run_db(db, exercise_catalog.build)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "public, max-age=300"}
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 # 운동 이름 검색
 @app.get("/exercises/search")
-def search_exercises(query: str, db: Session = Depends(get_db)):
+async def search_exercises(query: str, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_read_db)):
 
-    exercises = search_exercises_by_name(db, query)
+    exercises = await run_db(db, search_exercises_by_name, query, limit)
     return [
         {
             "id": exercise.id,
@@ -152,45 +274,130 @@ def search_exercises(query: str, db: Session = Depends(get_db)):
 
 # 사용자 프로필, 운동 완료 일수 불러오기
 @app.get("/users/{user_id}/profile")
-def get_user_profile_endpoint(user_id: int, db: Session = Depends(get_db)):
-    return get_user_profile(db, user_id)
+async def get_user_profile_endpoint(user_id: int, db: Session = Depends(get_read_db), viewer: Optional[CachedUser] = Depends(authenticate_user)):
+    # 친구 탭에서 다른 사용자의 프로필도 보므로 토큰만 확인 (본인 프로필이면 토큰의 사용자 정보로 조회 생략)
+    user = viewer if viewer and viewer.id == user_id else None
+    return await run_db(db, get_user_profile, user_id, user)
 
 # 운동 완료 날짜를 캘린더에 표시하기 - 사용자의 운동 기록 데이터 날짜 별로 가져오기
 @app.get("/users/{user_id}/records")
-def get_user_records_endpoint(user_id: int, db: Session = Depends(get_db)):
+async def get_user_records_endpoint(
+    user_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[CachedUser] = Depends(get_current_user)
+):
 
     from crud import get_user_records
-    return get_user_records(db, user_id)
+
+    headers = await collection_headers(db, user_id, "records")
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    records = await run_db(db, get_user_records, user_id, current_user)
+    response.headers.update(headers)
+    return records
+
+# 운동 기록 저장 (운동 완료)
+@app.post("/users/{user_id}/records")
+async def create_user_record(
+    user_id: int,
+    record_data: RecordCreate,
+    db: Session = Depends(get_db),
+    current_user: Optional[CachedUser] = Depends(get_current_user)
+):
+    from crud import create_record
+
+    record = await run_db(db, create_record, user_id, record_data, current_user)
+    return {
+        "id": record.id,
+        "date": record.datetime.date(),
+        "weight": record.weight,
+        "body_fat": record.body_fat,
+        "muscle_mass": record.muscle_mass,
+    }
+
+# 운동 완료 캘린더 - 월 범위(YYYY-MM)의 날짜 비트맵 반환 (기본: 이번 달, 최대 24개월)
+@app.get("/users/{user_id}/records/calendar", dependencies=[Depends(get_current_user)])
+async def get_user_calendar_endpoint(
+    user_id: int,
+    from_month: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_read_db)
+):
+    from crud import get_user_calendar
+
+    try:
+        start = datetime.strptime(from_month, "%Y-%m").date() if from_month else datetime.now().date().replace(day=1)
+        end = datetime.strptime(to_month, "%Y-%m").date() if to_month else start
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Months must be in YYYY-MM format.")
+    if end < start or (end.year - start.year) * 12 + end.month - start.month >= 24:
+        raise HTTPException(status_code=400, detail="Month range must be between 1 and 24 months.")
+
+    return await run_db(db, get_user_calendar, user_id, start, end)
 
 # 오운완 사진 DB 저장
-@app.post("/users/{user_id}/own_photos", response_model=OwnPhotoResponse)
-def upload_own_photo_endpoint(
+@app.post("/users/{user_id}/own_photos", response_model=OwnPhotoResponse, dependencies=[Depends(get_current_user)])
+async def upload_own_photo_endpoint(
     user_id: int,
     photo: OwnPhotoCreate,
     db: Session = Depends(get_db)
 ):
     try:
         # 사진 저장
-        photo_data = save_own_photo(db, user_id, photo.photo_path)
+        photo_data = await run_db(db, save_own_photo, user_id, photo.photo_path)
 
         # Pydantic 모델로 변환하여 반환
         return photo_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+# 오운완 사진 파일 업로드 (multipart 스트리밍, 내용 해시로 중복 제거) - 파일이 저장된 뒤에 DB 저장
+@app.post("/users/{user_id}/own_photos/upload", response_model=OwnPhotoResponse, dependencies=[Depends(get_current_user)])
+async def upload_own_photo_file(
+    user_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    from thumbnails import create_photo_variants
+    from uploads import receive_photo
+
+    photo_path = await receive_photo(request)
+    try:
+        photo = await run_db(db, save_own_photo, user_id, photo_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        # 저장된 파일은 다른 사진과 공유될 수 있으므로 지우지 않음 (참조가 없으면 GC에서 정리)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    # 썸네일/중간 크기 이미지는 응답 후 백그라운드에서 생성
+    background_tasks.add_task(create_photo_variants, OwnPhoto, photo.id, photo_path)
+    return photo
+
 # 내 오운완 사진 전체 조회
-@app.get("/users/{user_id}/own_photos", response_model=list[OwnPhotoResponse])
-def get_user_own_photos(user_id: int, db: Session = Depends(get_db)):
+@app.get("/users/{user_id}/own_photos", response_model=list[OwnPhotoResponse], dependencies=[Depends(get_current_user)])
+async def get_user_own_photos(user_id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_read_db)):
 
     from crud import get_own_photos_by_user
-    photos = get_own_photos_by_user(db, user_id)
+
+    headers = await collection_headers(db, user_id, "own_photos")
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    photos = await run_db(db, get_own_photos_by_user, user_id)
     if not photos:
         raise HTTPException(status_code=404, detail="No photos found for this user")
-    return photos
+    return json_list_response(own_photo_list_adapter, photos, headers)
 
 # 소셜탭에 오운완 사진 업로드 하기
-@app.post("/users/{user_id}/social/upload", response_model=OwnPhotoResponse)
-def upload_to_social_tab(
+@app.post("/users/{user_id}/social/upload", response_model=OwnPhotoResponse, dependencies=[Depends(get_current_user)])
+async def upload_to_social_tab(
     user_id: int,
     request: PhotoUploadRequest,
     db: Session = Depends(get_db)
@@ -198,25 +405,78 @@ def upload_to_social_tab(
 
     from crud import mark_photo_as_uploaded
 
-    photo = mark_photo_as_uploaded(db, request.photo_id, user_id)
+    photo = await run_db(db, mark_photo_as_uploaded, request.photo_id, user_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found or not authorized")
     return photo
 
-# 소셜탭에서 나랑 친구들이 업로드한 모든 사진 보기
-@app.get("/users/{user_id}/social/photos", response_model=list[OwnPhotoResponse])
-def get_all_social_photos(user_id: int, db: Session = Depends(get_db)):
+# 소셜탭에서 나랑 친구들이 업로드한 사진 보기 - 다음 페이지 커서는 X-Next-Cursor 헤더로 전달
+@app.get("/users/{user_id}/social/photos", response_model=list[OwnPhotoResponse], dependencies=[Depends(get_current_user)])
+async def get_all_social_photos(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
 
     from crud import get_social_photos
 
-    photos = get_social_photos(db, user_id)
-    if not photos:
+    photos = await run_db(db, get_social_photos, user_id, cursor, limit)
+    if not photos and cursor is None:
         raise HTTPException(status_code=404, detail="No social photos found")
-    return photos
+
+    next_page = next_cursor(photos, limit)
+    headers = {"X-Next-Cursor": next_page} if next_page else None
+    return json_list_response(own_photo_list_adapter, photos, headers)
+
+# 소셜탭 실시간 피드 (Server-Sent Events) - 나나 친구가 사진을 올리면 "event: photo" 로 바로 전송
+# 접속(재접속) 직후 GET /social/photos 로 한 번 불러오고, 이후에는 폴링 없이 이 스트림으로 새 사진만 받음
+# "event: resync" 를 받으면 (이벤트가 밀려 버려진 경우) 피드를 다시 불러와야 함
+@app.get("/users/{user_id}/social/stream", dependencies=[Depends(get_current_user)])
+async def stream_social_photos(user_id: int):
+    from crud import get_feed_author_ids
+    from live_feed import FEED_KEEPALIVE_SECONDS, feed_hub
+
+    if not feed_hub.started:
+        raise HTTPException(status_code=503, detail="Live feed is not available")
+
+    # 스트리밍 중에는 요청 의존성(get_read_db) 세션이 이미 닫혀 있으므로 조회할 때마다 세션 생성
+    def load_authors():
+        db = ReadSessionLocal()
+        try:
+            return get_feed_author_ids(db, user_id)
+        finally:
+            db.close()
+
+    async def events():
+        subscription = feed_hub.subscribe(user_id, await run_in_threadpool(load_authors))
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if message["type"] == "photo":
+                    photo = message["photo"]
+                    yield f"id: {photo['id']}\nevent: photo\ndata: {json.dumps(photo, ensure_ascii=False)}\n\n"
+                elif message["type"] == "friends_changed":
+                    # 친구 추가/삭제 후에는 받을 사용자 목록을 다시 조회
+                    feed_hub.update_authors(subscription, await run_in_threadpool(load_authors))
+                else:
+                    yield "event: resync\ndata: {}\n\n"
+        finally:
+            feed_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # 식단 사진 DB 저장
-@app.post("/users/{user_id}/meal_photos", response_model=MealPhotoResponse)
-def upload_meal_photo(
+@app.post("/users/{user_id}/meal_photos", response_model=MealPhotoResponse, dependencies=[Depends(get_current_user)])
+async def upload_meal_photo(
     user_id: int,
     photo: MealPhotoCreate,
     db: Session = Depends(get_db)
@@ -226,25 +486,79 @@ def upload_meal_photo(
 
     try:
         # 식단 사진 저장
-        meal_photo = save_meal_photo(db, user_id, photo.photo_path)
+        meal_photo = await run_db(db, save_meal_photo, user_id, photo.photo_path)
         return meal_photo
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-# 내 식단 사진 전체 조회
-@app.get("/users/{user_id}/meal_photos", response_model=list[MealPhotoResponse])
-def get_meal_photos(user_id: int, db: Session = Depends(get_db)):
+# 식단 사진 파일 업로드 (multipart 스트리밍, 내용 해시로 중복 제거) - 파일이 저장된 뒤에 DB 저장
+@app.post("/users/{user_id}/meal_photos/upload", response_model=MealPhotoResponse, dependencies=[Depends(get_current_user)])
+async def upload_meal_photo_file(
+    user_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    from crud import save_meal_photo
+    from thumbnails import create_photo_variants
+    from uploads import receive_photo
+
+    photo_path = await receive_photo(request)
+    try:
+        photo = await run_db(db, save_meal_photo, user_id, photo_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        # 저장된 파일은 다른 사진과 공유될 수 있으므로 지우지 않음 (참조가 없으면 GC에서 정리)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-    from crud import get_all_meal_photos_by_user
+    # 썸네일/중간 크기 이미지는 응답 후 백그라운드에서 생성
+    background_tasks.add_task(create_photo_variants, MealPhoto, photo.id, photo_path)
+    return photo
 
-    photos = get_all_meal_photos_by_user(db, user_id)
-    if not photos:
+# 내 식단 사진 조회 - from/to(YYYY-MM-DD, 양 끝 포함) 기간을 최신순으로 (없으면 전체)
+# limit 을 주면 페이지 단위로 잘라서 다음 페이지 커서를 X-Next-Cursor 헤더로 전달
+# group_by=day 이면 날짜별로 묶어서 반환 (페이지 경계에 걸친 날은 다음 페이지에 같은 날짜로 이어짐)
+@app.get("/users/{user_id}/meal_photos", response_model=Union[List[MealPhotoResponse], List[MealPhotoDayResponse]], dependencies=[Depends(get_current_user)])
+async def get_meal_photos(
+    user_id: int,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    group_by: Optional[Literal["day"]] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
+
+    from crud import get_meal_photos_by_user, group_meal_photos_by_day
+
+    if from_date and to_date and to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be earlier than 'from'.")
+
+    # 조회 조건마다 응답이 다르므로 조건별로 다른 ETag
+    filters = (from_date, to_date, cursor, limit, group_by)
+    variant = ":".join("" if value is None else str(value) for value in filters) if any(filters) else ""
+    headers = await collection_headers(db, user_id, "meal_photos", variant)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    photos = await run_db(db, get_meal_photos_by_user, user_id, from_date, to_date, cursor, limit)
+    if not photos and not (from_date or to_date or cursor):
         raise HTTPException(status_code=404, detail="No meal photos found for this user")
-    return photos
+
+    next_page = next_cursor(photos, limit) if limit else None
+    if next_page:
+        headers["X-Next-Cursor"] = next_page
+    if group_by == "day":
+        return json_list_response(meal_photo_day_list_adapter, group_meal_photos_by_day(photos), headers)
+    return json_list_response(meal_photo_list_adapter, photos, headers)
 
 # 사용자의 체중 및 골격근량, 체지방률 기록 추가
-@app.post("/users/{user_id}/body_metrics", response_model=BodyMetricsResponse)
-def add_body_metrics(
+@app.post("/users/{user_id}/body_metrics", response_model=BodyMetricsResponse, dependencies=[Depends(get_current_user)])
+async def add_body_metrics(
     user_id: int,
     metrics_data: BodyMetricsCreate,
     db: Session = Depends(get_db),
@@ -252,24 +566,41 @@ def add_body_metrics(
     from crud import create_body_metrics
     try:
         # CRUD 함수 호출
-        new_metrics = create_body_metrics(db, user_id, metrics_data)
+        new_metrics = await run_db(db, create_body_metrics, user_id, metrics_data)
         return new_metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save body metrics: {str(e)}")
 
 # 사용자의 체중 및 골격근량, 체지방률 기록 조회
-@app.get("/users/{user_id}/body_metrics", response_model=List[BodyMetricsResponse])
-def get_body_metrics(user_id: int, db: Session = Depends(get_db)):
+# resolution=week|month 이면 기간별 집계, points=N 이면 차트용으로 N개 이하로 다운샘플(LTTB)
+@app.get("/users/{user_id}/body_metrics", response_model=Union[List[BodyMetricsResponse], List[BodyMetricsRollupResponse]], dependencies=[Depends(get_current_user)])
+async def get_body_metrics(
+    user_id: int,
+    resolution: Optional[Literal["week", "month"]] = None,
+    points: Optional[int] = Query(None, ge=3, le=1000),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
 
-    from crud import get_user_body_metrics
+    from crud import get_body_metrics_chart
+
+    # 같은 기록이라도 집계/다운샘플 옵션마다 응답이 다르므로 옵션별로 다른 ETag
+    variant = f"{resolution}:{points}" if resolution or points else ""
+    headers = await collection_headers(db, user_id, "body_metrics", variant)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
 
     try:
-        records = get_user_body_metrics(db, user_id)
+        records = await run_db(db, get_body_metrics_chart, user_id, resolution, points)
         if not records:
             raise HTTPException(status_code=404, detail="No records found for the user")
-        
-        # Pydantic 스키마로 변환
-        return [BodyMetricsResponse.from_orm(record) for record in records]
+
+        # 컬럼 튜플/집계 dict 를 스키마로 한 번만 검증해 바로 JSON 으로 변환
+        if resolution:
+            return json_list_response(body_metrics_rollup_list_adapter, records, headers)
+        return json_list_response(body_metrics_list_adapter, records, headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch records: {str(e)}")
     
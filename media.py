@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+from cache import etag_matches
+from uploads import UPLOAD_DIR, blob_digest
+
+# static/uploads 미디어 서빙 - 내용 해시 ETag, Range 요청, 내용 주소 파일은 immutable 캐시
+
+# nginx 등 프록시 뒤에서 실행할 때 파일 전송을 프록시의 sendfile에 맡김 (예: "/protected_uploads/")
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# 파일 이름(확장자/변형 접미사 제외)이 sha256 해시면 내용 주소 파일로 취급
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+
+
+class _EtagCache:
+    """
+    (경로, 수정 시각, 크기) -> 내용 해시 ETag LRU 캐시 - 같은 파일을 매번 해싱하지 않도록
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            etag = self._entries.get(key)
+            if etag is not None:
+                self._entries.move_to_end(key)
+            return etag
+
+    def put(self, key, etag: str):
+        with self._lock:
+            self._entries[key] = etag
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_etag_cache = _EtagCache()
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse의 If-Range 비교를 mtime 기반이 아닌 내용 해시 ETag로 하도록 변경
+    """
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        return http_if_range == self.headers.get("etag") or super()._should_use_range(http_if_range, stat_result)
+
+
+def resolve_media_path(file_path: str) -> str:
+    """
+    요청 경로를 static/uploads 내부의 실제 파일 경로로 변환 (디렉터리 밖 접근 차단)
+    """
+    root = os.path.realpath(UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path) or path.endswith(".part"):
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+async def serve_media(file_path: str, if_none_match: Optional[str]) -> Response:
+    path = resolve_media_path(file_path)
+    stat_result = os.stat(path)
+
+    name = os.path.basename(path)
+    digest = blob_digest(os.path.join(UPLOAD_DIR, name))
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    if digest:
+        etag = f'"{digest[:32]}"'  # 원본 내용 주소 파일은 이름이 곧 내용 해시
+    else:
+        etag = _etag_cache.get(key)
+        if etag is None:
+            etag = await run_in_threadpool(_hash_file, path)
+            _etag_cache.put(key, etag)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if CONTENT_ADDRESSED_NAME.match(name) else REVALIDATE_CACHE_CONTROL,
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if MEDIA_ACCEL_REDIRECT:
+        relative = os.path.relpath(path, os.path.realpath(UPLOAD_DIR)).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+        return Response(headers=headers, media_type=None)
+
+    return MediaFileResponse(path, headers=headers, stat_result=stat_result)
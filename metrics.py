@@ -0,0 +1,245 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# 요청별 성능 계측 - 라우트별 지연 시간 히스토그램, SQL 실행 수/DB 시간, 조회 행 수, N+1 의심 패턴
+# 결과는 GET /metrics 에서 Prometheus 텍스트 형식으로 제공 (프로세스(워커)별 값)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# 한 요청 안에서 같은 SQL(파라미터 제외)이 이 횟수 이상 실행되면 N+1 의심으로 기록
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+EXCLUDED_PATHS = {"/metrics"}
+
+
+class RequestStats:
+    """
+    요청 하나 동안 누적되는 DB 사용량 (컨텍스트 변수로 스레드풀/greenlet 안의 DB 호출까지 전달됨)
+    """
+
+    __slots__ = ("statements", "db_time", "rows", "statement_counts")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.statement_counts: Counter = Counter()
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements_per_request = Histogram(STATEMENT_BUCKETS)
+        self.statuses: Counter = Counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.n_plus_one = 0
+
+
+class MetricsRegistry:
+    """
+    (메서드, 라우트 경로 템플릿) 별 누적 지표
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = defaultdict(RouteMetrics)
+        self._warned: set = set()
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        repeated = [(sql, count) for sql, count in stats.statement_counts.items() if count >= N_PLUS_ONE_THRESHOLD]
+        with self._lock:
+            metrics = self._routes[(method, route)]
+            metrics.latency.observe(duration)
+            metrics.statements_per_request.observe(stats.statements)
+            metrics.statuses[status] += 1
+            metrics.statements += stats.statements
+            metrics.db_time += stats.db_time
+            metrics.rows += stats.rows
+            if repeated:
+                metrics.n_plus_one += 1
+            new_warnings = [(sql, count) for sql, count in repeated if (method, route, sql) not in self._warned]
+            self._warned.update((method, route, sql) for sql, _ in new_warnings)
+
+        # 같은 라우트/SQL 조합은 한 번만 경고 (이후는 카운터로만 집계)
+        for sql, count in new_warnings:
+            logger.warning("Possible N+1 in %s %s: statement ran %d times in one request: %s", method, route, count, " ".join(sql.split())[:300])
+
+    def render(self) -> str:
+        """
+        Prometheus 텍스트 형식 (text/plain; version=0.0.4)
+        """
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines: List[str] = []
+
+            def metric(name: str, kind: str, help_text: str):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            def histogram(name: str, attr: str):
+                for (method, route), metrics in routes:
+                    hist = getattr(metrics, attr)
+                    labels = _labels(method=method, route=route)
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{_format(bound)}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {_format(hist.total)}")
+                    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+            def per_route(name: str, attr: str):
+                for (method, route), metrics in routes:
+                    lines.append(f"{name}{{{_labels(method=method, route=route)}}} {_format(getattr(metrics, attr))}")
+
+            metric("http_requests_total", "counter", "HTTP requests by route and status code.")
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+            metric("http_request_duration_seconds", "histogram", "Time until the response body was sent.")
+            histogram("http_request_duration_seconds", "latency")
+
+            metric("db_statements_per_request", "histogram", "SQL statements executed per request.")
+            histogram("db_statements_per_request", "statements_per_request")
+
+            metric("db_statements_total", "counter", "SQL statements executed while handling the route.")
+            per_route("db_statements_total", "statements")
+
+            metric("db_time_seconds_total", "counter", "Time spent executing SQL statements.")
+            per_route("db_time_seconds_total", "db_time")
+
+            metric("db_rows_loaded_total", "counter", "Rows returned by ORM queries.")
+            per_route("db_rows_loaded_total", "rows")
+
+            metric("db_n_plus_one_requests_total", "counter", f"Requests that ran an identical statement at least {N_PLUS_ONE_THRESHOLD} times.")
+            per_route("db_n_plus_one_requests_total", "n_plus_one")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for key, value in labels.items()}
+    return ",".join(f'{key}="{value}"' for key, value in escaped.items())
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+# --- SQLAlchemy 이벤트 ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_start")
+    if started:
+        stats.db_time += time.perf_counter() - started.pop()
+    stats.statements += 1
+    stats.statement_counts[statement] += 1
+
+
+def _count_loaded_rows(orm_execute_state):
+    """
+    ORM SELECT 결과를 고정(freeze)해서 행 수를 센 뒤 같은 결과를 그대로 돌려줌 (계측 중인 요청에서만)
+    """
+    stats = _current.get()
+    if stats is None or not orm_execute_state.is_select:
+        return None
+    frozen = orm_execute_state.invoke_statement().freeze()
+    stats.rows += len(frozen.data)
+    return frozen()
+
+
+def instrument_engines(*engines):
+    """
+    SQL 실행 수/시간 측정 이벤트 등록 (동기 Engine, AsyncEngine 모두 가능)
+    """
+    for bind in engines:
+        bind = getattr(bind, "sync_engine", bind)
+        if not event.contains(bind, "before_cursor_execute", _before_cursor_execute):
+            event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+            event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Session, "do_orm_execute", _count_loaded_rows):
+        event.listen(Session, "do_orm_execute", _count_loaded_rows)
+
+
+class MetricsMiddleware:
+    """
+    요청마다 RequestStats 를 컨텍스트에 두고, 응답 본문 전송이 끝난 시점에 라우트별로 기록
+    (응답 후 실행되는 BackgroundTasks 는 지연 시간/SQL 수에 포함하지 않음)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        state = {"status": 500, "recorded": False}
+
+        def finish():
+            if state["recorded"] or state.get("streaming"):  # SSE 같은 장시간 스트림은 지연 시간 집계에서 제외
+                return
+            state["recorded"] = True
+            route = scope.get("route")
+            registry.record(scope["method"], getattr(route, "path", "unmatched"), state["status"], time.perf_counter() - started, stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                state["streaming"] = any(
+                    key.lower() == b"content-type" and value.startswith(b"text/event-stream") for key, value in message.get("headers", ())
+                )
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+                _current.set(None)  # 이후 BackgroundTasks 의 DB 호출은 집계하지 않음
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _current.reset(token)
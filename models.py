@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, Date, DateTime, ForeignKey, UniqueConstraint,  Float
+from sqlalchemy import Column, Integer, String, Boolean, Text, Date, DateTime, ForeignKey, UniqueConstraint,  Float, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -54,6 +54,13 @@ class Routine(Base):
     sets = Column(Integer, nullable=False)  # 세트 수
     reps = Column(Integer, nullable=False)  # 반복 횟수
 
+    __table_args__ = (
+        # 같은 루틴에 같은 운동 중복 저장 방지 (임시 저장 시 INSERT ... ON CONFLICT 대상)
+        Index('ux_routines_user_exercise_routine', 'user_id', 'exercise_id', 'routine_id', unique=True),
+        # 루틴 단위(이름 변경, 조회) 접근용 인덱스
+        Index('ix_routines_user_routine', 'user_id', 'routine_id'),
+    )
+
     # Relationships
     user = relationship("User")
     exercise = relationship("ExerciseName")
@@ -67,6 +74,11 @@ class OwnPhoto(Base):
     datetime = Column(DateTime, nullable=False)
     photo_path = Column(Text, nullable=False)
     is_uploaded = Column(Boolean, default=False)  # 소셜탭 업로드 여부 추가
+    thumbnail_path = Column(Text, nullable=True)  # 썸네일 (목록/그리드용)
+    medium_path = Column(Text, nullable=True)  # 중간 크기 이미지
+
+    # 소셜 피드 페이지 조회용 복합 인덱스 (업로드 여부 -> 사용자 -> 시간 순 범위 스캔)
+    __table_args__ = (Index('ix_own_photos_uploaded_user_datetime', 'is_uploaded', 'user_id', 'datetime'),)
 
     # Relationships
     user = relationship("User", back_populates="own_photos")
@@ -79,10 +91,41 @@ class MealPhoto(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # 사용자 ID
     datetime = Column(DateTime, nullable=False)  # 사진 찍은 날짜 및 시간
     photo_path = Column(Text, nullable=False)  # 사진 경로
+    thumbnail_path = Column(Text, nullable=True)  # 썸네일 (목록/그리드용)
+    medium_path = Column(Text, nullable=True)  # 중간 크기 이미지
+
+    # 식단 화면(하루/한 주) 조회용 복합 인덱스 (사용자 -> 시간 순 범위 스캔)
+    __table_args__ = (Index('ix_meal_photos_user_datetime', 'user_id', 'datetime'),)
 
     # Relationships
     user = relationship("User", back_populates="meal_photos")
 
+class PhotoBlob(Base):
+    __tablename__ = "photo_blobs"
+
+    sha256 = Column(String, primary_key=True)  # 파일 내용 해시 (파일 이름)
+    path = Column(Text, nullable=False)  # static/uploads/{sha256}.jpg
+    ref_count = Column(Integer, nullable=False, default=0)  # own_photos + meal_photos 에서 참조하는 수
+    created_at = Column(DateTime, nullable=False)
+
+class TimelineEntry(Base):
+    __tablename__ = "timeline_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # 피드를 보는 사용자
+    photo_id = Column(Integer, ForeignKey("own_photos.id"), nullable=False)  # 소셜탭에 올라간 오운완 사진
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # 사진 올린 사용자 (친구 삭제 시 정리용)
+    datetime = Column(DateTime, nullable=False)  # 사진 시간 (피드 정렬 기준)
+
+    __table_args__ = (
+        # 같은 사진이 한 피드에 중복으로 들어가지 않도록 (fan-out 시 INSERT ... ON CONFLICT 대상)
+        UniqueConstraint('user_id', 'photo_id', name='unique_timeline_entry'),
+        # 피드 조회용 - 사용자 한 명의 최신순 범위 스캔
+        Index('ix_timeline_entries_user_datetime', 'user_id', 'datetime', 'photo_id'),
+        # 친구 삭제 시 해당 친구 사진만 정리
+        Index('ix_timeline_entries_user_author', 'user_id', 'author_id'),
+    )
+
 class Record(Base):
     __tablename__ = "records"
 
@@ -93,9 +136,32 @@ class Record(Base):
     body_fat = Column(Integer, nullable=False)  # 체지방량
     muscle_mass = Column(Integer, nullable=False)  # 골격근량
 
+    # 캘린더(월 단위) 조회용 인덱스
+    __table_args__ = (Index('ix_records_user_datetime', 'user_id', 'datetime'),)
+
     # Relationships
     user = relationship("User", back_populates="records")
 
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # 사용자 ID
+    completed_days = Column(Integer, nullable=False, default=0)  # 운동한 날 수
+    current_streak = Column(Integer, nullable=False, default=0)  # 마지막 운동일까지 연속 운동 일수
+    longest_streak = Column(Integer, nullable=False, default=0)  # 최장 연속 운동 일수
+    last_workout_date = Column(Date, nullable=True)  # 마지막 운동 날짜
+    own_photo_count = Column(Integer, nullable=False, default=0)  # 오운완 사진 수
+    meal_photo_count = Column(Integer, nullable=False, default=0)  # 식단 사진 수
+    friend_count = Column(Integer, nullable=False, default=0)  # 친구 수 (소셜 피드 fan-out 여부 판단용)
+
+class CollectionVersion(Base):
+    __tablename__ = "collection_versions"
+
+    # 사용자별 컬렉션(own_photos, meal_photos, body_metrics, records, friends) 변경 횟수 - 조건부 GET 의 ETag 로 사용
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # 사용자 ID
+    collection = Column(String, primary_key=True)  # 컬렉션 이름
+    version = Column(Integer, nullable=False, default=0)  # 쓰기마다 1씩 증가
+
 class BodyMetrics(Base):
     __tablename__ = "body_metrics"
 
@@ -107,4 +173,30 @@ class BodyMetrics(Base):
     body_fat_percentage = Column(Float, nullable=False)  # 체지방률 (%)
 
     # Relationships
-    user = relationship("User", back_populates="body_metrics")
\ No newline at end of file
+    user = relationship("User", back_populates="body_metrics")
+
+class BodyMetricsRollup(Base):
+    __tablename__ = "body_metrics_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # 사용자 ID
+    resolution = Column(String, nullable=False)  # 집계 단위 ("week" / "month")
+    period_start = Column(Date, nullable=False)  # 기간 시작일 (주: 월요일, 월: 1일)
+    count = Column(Integer, nullable=False, default=0)  # 기간 내 기록 수
+    last_date = Column(Date, nullable=True)  # 기간 내 가장 최근 기록 날짜
+
+    # 지표별 최소, 최대, 합계(평균 계산용), 최근 값
+    weight_min = Column(Float, nullable=True)
+    weight_max = Column(Float, nullable=True)
+    weight_sum = Column(Float, nullable=True)
+    weight_last = Column(Float, nullable=True)
+    muscle_mass_min = Column(Float, nullable=True)
+    muscle_mass_max = Column(Float, nullable=True)
+    muscle_mass_sum = Column(Float, nullable=True)
+    muscle_mass_last = Column(Float, nullable=True)
+    body_fat_percentage_min = Column(Float, nullable=True)
+    body_fat_percentage_max = Column(Float, nullable=True)
+    body_fat_percentage_sum = Column(Float, nullable=True)
+    body_fat_percentage_last = Column(Float, nullable=True)
+
+    __table_args__ = (UniqueConstraint('user_id', 'resolution', 'period_start', name='unique_body_metrics_rollup'),)
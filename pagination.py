@@ -0,0 +1,31 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+
+# 키셋(커서) 페이지네이션 - (datetime, id) 정렬 기준의 마지막 항목을 커서로 사용
+
+def encode_cursor(dt: datetime, row_id: int) -> str:
+    raw = f"{dt.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        dt_str, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(dt_str), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def next_cursor(rows: list, limit: int) -> Optional[str]:
+    """
+    페이지가 꽉 찼을 때만 다음 페이지 커서를 반환
+    """
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.datetime, last.id)
@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Sequence
+
+# 체중/골격근량/체지방률 기간별 집계(주, 월)와 차트용 다운샘플링(LTTB)
+
+ROLLUP_METRICS = ("weight", "muscle_mass", "body_fat_percentage")
+ROLLUP_RESOLUTIONS = ("week", "month")
+
+
+def period_start(record_date: date, resolution: str) -> date:
+    if resolution == "week":
+        return record_date - timedelta(days=record_date.weekday())  # 월요일 기준
+    return record_date.replace(day=1)
+
+
+def apply_metrics(rollup, metrics):
+    """
+    집계 행(rollup)에 측정값 하나를 더함 - min/max/sum/count, 가장 최근 날짜의 값(last)
+    """
+    is_latest = rollup.last_date is None or metrics.record_date >= rollup.last_date
+    for name in ROLLUP_METRICS:
+        value = getattr(metrics, name)
+        if not rollup.count:
+            setattr(rollup, f"{name}_min", value)
+            setattr(rollup, f"{name}_max", value)
+            setattr(rollup, f"{name}_sum", 0.0)
+        setattr(rollup, f"{name}_min", min(getattr(rollup, f"{name}_min"), value))
+        setattr(rollup, f"{name}_max", max(getattr(rollup, f"{name}_max"), value))
+        setattr(rollup, f"{name}_sum", getattr(rollup, f"{name}_sum") + value)
+        if is_latest:
+            setattr(rollup, f"{name}_last", value)
+    if is_latest:
+        rollup.last_date = metrics.record_date
+    rollup.count = (rollup.count or 0) + 1
+
+
+def rollup_to_dict(rollup) -> dict:
+    result = {
+        "resolution": rollup.resolution,
+        "period_start": rollup.period_start,
+        "count": rollup.count,
+    }
+    for name in ROLLUP_METRICS:
+        result[name] = {
+            "min": getattr(rollup, f"{name}_min"),
+            "max": getattr(rollup, f"{name}_max"),
+            "mean": getattr(rollup, f"{name}_sum") / rollup.count,
+            "last": getattr(rollup, f"{name}_last"),
+        }
+    return result
+
+
+def lttb(rows: Sequence, points: int, x: Callable, ys: Sequence[Callable]) -> List:
+    """
+    Largest-Triangle-Three-Buckets 다운샘플링 - 첫/마지막 점을 유지하고 각 버킷에서 삼각형 넓이가 가장 큰 점 선택
+    여러 값(ys)은 각각 범위로 정규화한 넓이의 합으로 비교해 모든 지표의 모양이 유지되도록 함
+    """
+    if points >= len(rows):
+        return list(rows)
+    if points < 3:
+        raise ValueError("points must be at least 3")
+
+    xs = [x(row) for row in rows]
+    series = []
+    for y in ys:
+        values = [y(row) for row in rows]
+        spread = (max(values) - min(values)) or 1.0
+        series.append([value / spread for value in values])
+
+    selected = [0]
+    bucket_size = (len(rows) - 2) / (points - 2)
+    previous = 0
+    for bucket in range(points - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, len(rows))
+        if next_start >= next_end:
+            next_start, next_end = len(rows) - 1, len(rows)
+
+        # 다음 버킷의 평균 점
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_ys = [sum(values[next_start:next_end]) / (next_end - next_start) for values in series]
+
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = sum(
+                abs((xs[previous] - avg_x) * (values[index] - values[previous])
+                    - (xs[previous] - xs[index]) * (avg_y - values[previous]))
+                for values, avg_y in zip(series, avg_ys)
+            )
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+
+    selected.append(len(rows) - 1)
+    return [rows[index] for index in selected]
+
+
+class _Rollup:
+    """
+    DB에 저장된 집계가 없을 때 메모리에서 계산하기 위한 집계 행
+    """
+
+    def __init__(self, resolution: str, start: date):
+        self.resolution = resolution
+        self.period_start = start
+        self.count = 0
+        self.last_date = None
+
+
+def compute_rollups(metrics_rows: Sequence, resolution: str) -> List:
+    rollups: Dict[date, _Rollup] = {}
+    for metrics in metrics_rows:
+        start = period_start(metrics.record_date, resolution)
+        rollup = rollups.get(start)
+        if rollup is None:
+            rollup = rollups[start] = _Rollup(resolution, start)
+        apply_metrics(rollup, metrics)
+    return [rollups[start] for start in sorted(rollups)]
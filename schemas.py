@@ -25,6 +25,8 @@ class UserLoginResponse(BaseModel):
 
     message: str
     user: dict
+    access_token: Optional[str] = None
+    token_type: str = "bearer"
 
 class PhotoUploadRequest(BaseModel):
     photo_id: int
@@ -35,41 +37,24 @@ class PhotoUploadResponse(BaseModel):
     photo_path: str
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class OwnPhotoCreate(BaseModel) :
     photo_path: str
 
 
-class OwnPhotoResponse(BaseModel):
-    id: int
-    user_id: int
-    datetime: datetime
-    photo_path: str
-    is_uploaded: bool
-
-    class Config:
-        orm_mode = True
-class OwnPhotoResponse(BaseModel):
-    id: int
-    user_id: int
-    photo_path: Optional[str]
-    is_uploaded: bool
-    # base64: Optional[str] = None  # Base64 데이터 추가
-
-    class Config:
-        orm_mode = True
-
 class OwnPhotoResponse(BaseModel):
     id: int
     user_id: int
     datetime: datetime 
     photo_path: str
     is_uploaded: bool
+    thumbnail_path: Optional[str] = None  # 썸네일 경로 (생성 전이면 None)
+    medium_path: Optional[str] = None  # 중간 크기 이미지 경로
     # base64_image: Optional[str]  # Base64 이미지 필드 추가 (선택적)
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class MealPhotoCreate(BaseModel):
     photo_path: str
@@ -79,9 +64,15 @@ class MealPhotoResponse(BaseModel):
     user_id: int
     datetime: datetime
     photo_path: str
+    thumbnail_path: Optional[str] = None  # 썸네일 경로 (생성 전이면 None)
+    medium_path: Optional[str] = None  # 중간 크기 이미지 경로
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class MealPhotoDayResponse(BaseModel):
+    date: date  # 날짜
+    photos: List[MealPhotoResponse]  # 그 날의 식단 사진 (최신순)
 
 class SocialPhotoResponse(BaseModel):
     id: int
@@ -91,11 +82,17 @@ class SocialPhotoResponse(BaseModel):
     is_uploaded: bool
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class SocialPhotosResponse(BaseModel):
     photos: List[SocialPhotoResponse]
 
+class RecordCreate(BaseModel):
+    record_datetime: Optional[datetime] = Field(None, alias="datetime")  # 기록 날짜 및 시간 (없으면 현재 시간)
+    weight: int  # 몸무게
+    body_fat: int  # 체지방량
+    muscle_mass: int  # 골격근량
+
 class BodyMetricsCreate(BaseModel):
     record_date: date  # 기록 날짜
     weight: float  # 체중
@@ -114,13 +111,28 @@ class BodyMetricsResponse(BaseModel):
         # orm_mode = True
          from_attributes = True 
 
+# 기간별 지표 요약 (최소, 최대, 평균, 기간 내 마지막 값)
+class MetricSummary(BaseModel):
+    min: float
+    max: float
+    mean: float
+    last: float
+
+class BodyMetricsRollupResponse(BaseModel):
+    resolution: Literal["week", "month"]  # 집계 단위
+    period_start: date  # 기간 시작일
+    count: int  # 기간 내 기록 수
+    weight: MetricSummary  # 체중
+    muscle_mass: MetricSummary  # 골격근량
+    body_fat_percentage: MetricSummary  # 체지방률
+
 class ExerciseUpdateRequest(BaseModel):
     exercise_id: int
     sets: int
     reps: int
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class RoutineResponse(BaseModel):
     id: int
@@ -144,14 +156,14 @@ class RoutineUpdateRequest(BaseModel):
     exercises: List[ExerciseUpdateRequest]  # 수정할 운동들
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 # 루틴 이름을 업데이트하기 위한 요청 데이터
 class RoutineNameUpdateRequest(BaseModel):
     routine_name: str  # 루틴 이름
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 
 # 응답 스키마 - 루틴 이름 업데이트 후의 루틴 정보 반환
@@ -163,7 +175,23 @@ class RoutineResponse(BaseModel):
     reps: int  # 반복 횟수
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+
+# 루틴 조회 - 루틴에 포함된 운동 하나
+class RoutineExerciseResponse(BaseModel):
+    id: int  # 루틴 행 ID
+    exercise_id: int  # 운동 ID
+    exercise_name: str  # 운동 이름
+    target_area: Optional[str] = None  # 자극 부위
+    sets: int  # 세트 수
+    reps: int  # 반복 횟수
+
+# 루틴 조회 - routine_id 별로 묶인 루틴
+class RoutineDetailResponse(BaseModel):
+    routine_id: int  # 루틴 ID
+    routine_name: Optional[str] = None  # 루틴 이름
+    exercises: List[RoutineExerciseResponse]  # 루틴에 포함된 운동들
 
 
 #루틴 이름이랑 여러 운동 데이터 저장용
@@ -0,0 +1,128 @@
+import heapq
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Set
+from sqlalchemy.orm import Session
+from models import ExerciseName
+
+# 운동 이름 검색용 메모리 인덱스 - 부분 문자열(n-gram), 초성 검색, 접두어 우선 정렬
+
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+HANGUL_START, HANGUL_END = 0xAC00, 0xD7A3
+NGRAM = 2
+
+
+class ExerciseEntry(NamedTuple):
+    id: int
+    name: str
+    target_area: str
+
+
+def normalize(text: str) -> str:
+    return "".join(text.split()).lower()
+
+
+def to_choseong(text: str) -> str:
+    """
+    한글 음절은 초성으로 바꾸고 나머지 문자는 그대로 둠 (예: 벤치프레스 -> ㅂㅊㅍㄹㅅ)
+    """
+    result = []
+    for char in text:
+        code = ord(char)
+        if HANGUL_START <= code <= HANGUL_END:
+            result.append(CHOSEONG[(code - HANGUL_START) // 588])
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def is_choseong_query(text: str) -> bool:
+    return any(char in CHOSEONG for char in text)
+
+
+def ngrams(text: str) -> Set[str]:
+    if len(text) < NGRAM:
+        return {text} if text else set()
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class _Index:
+    def __init__(self, entries: List[ExerciseEntry]):
+        self.entries = entries
+        self.names = [normalize(entry.name) for entry in entries]
+        self.choseongs = [to_choseong(name) for name in self.names]
+        self.name_grams = self._build(self.names)
+        self.choseong_grams = self._build(self.choseongs)
+
+    @staticmethod
+    def _build(keys: List[str]) -> Dict[str, Set[int]]:
+        postings: Dict[str, Set[int]] = defaultdict(set)
+        for position, key in enumerate(keys):
+            for char in key:
+                postings[char].add(position)
+            for gram in ngrams(key):
+                postings[gram].add(position)
+        return dict(postings)
+
+    def search(self, query: str, limit: int) -> List[ExerciseEntry]:
+        if is_choseong_query(query):
+            query, keys, postings = to_choseong(query), self.choseongs, self.choseong_grams
+        else:
+            keys, postings = self.names, self.name_grams
+
+        # 가장 짧은 posting부터 교집합 후 실제 포함 여부로 최종 확인
+        candidate_sets = sorted((postings.get(gram, set()) for gram in ngrams(query)), key=len)
+        if not candidate_sets or not candidate_sets[0]:
+            return []
+        candidates = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+
+        ranked = []
+        for position in candidates:
+            offset = keys[position].find(query)
+            if offset < 0:
+                continue
+            # 정확히 일치 > 접두어 > 부분 일치, 같은 순위면 앞쪽에서 일치하고 짧은 이름 우선
+            rank = 0 if keys[position] == query else 1 if offset == 0 else 2
+            ranked.append((rank, offset, len(keys[position]), self.entries[position].id, position))
+
+        return [self.entries[item[-1]] for item in heapq.nsmallest(limit, ranked)]
+
+
+class ExerciseSearchIndex:
+    """
+    exercise_names 전체를 메모리에 올려 두고 검색하는 인덱스
+    서버 시작 시 build, 카탈로그가 바뀌면 invalidate (외부 변경은 refresh_interval 주기로 반영)
+    """
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        self._index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def build(self, db: Session):
+        rows = db.query(ExerciseName.id, ExerciseName.name, ExerciseName.target_area).order_by(ExerciseName.id).all()
+        index = _Index([ExerciseEntry(row.id, row.name, row.target_area) for row in rows])
+        with self._lock:
+            self._index = index
+            self._built_at = time.monotonic()
+        return index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def search(self, db: Session, query: str, limit: int = 20) -> List[ExerciseEntry]:
+        # invalidate 가 동시에 self._index 를 비워도 이번 검색은 읽어 둔 인덱스로 처리
+        index = self._index
+        if index is None or time.monotonic() - self._built_at > self.refresh_interval:
+            index = self.build(db)
+
+        query = normalize(query)
+        if not query:
+            return []
+        return index.search(query, limit)
+
+
+exercise_index = ExerciseSearchIndex()
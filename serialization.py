@@ -0,0 +1,22 @@
+from typing import Dict, List, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+from schemas import OwnPhotoResponse, MealPhotoResponse, MealPhotoDayResponse, BodyMetricsResponse, BodyMetricsRollupResponse
+
+# 목록 응답 빠른 직렬화
+# 모듈 로드 시 한 번 만든 TypeAdapter 로 행을 한 번만 검증하고, pydantic-core(Rust) 인코더로 바로 JSON 바이트 생성
+# Response 를 직접 반환하므로 FastAPI 의 response_model 검증/jsonable_encoder 단계는 다시 타지 않음 (response_model 은 문서용)
+
+own_photo_list_adapter = TypeAdapter(List[OwnPhotoResponse])
+meal_photo_list_adapter = TypeAdapter(List[MealPhotoResponse])
+meal_photo_day_list_adapter = TypeAdapter(List[MealPhotoDayResponse])
+body_metrics_list_adapter = TypeAdapter(List[BodyMetricsResponse])
+body_metrics_rollup_list_adapter = TypeAdapter(List[BodyMetricsRollupResponse])
+
+
+def json_list_response(adapter: TypeAdapter, rows: list, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    ORM 객체, 컬럼 튜플(Row), dict 모두 속성/키로 읽어서 검증 후 JSON 응답 생성
+    """
+    items = adapter.validate_python(rows, from_attributes=True)
+    return Response(content=adapter.dump_json(items), media_type="application/json", headers=headers)
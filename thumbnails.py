@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow가 없으면 파생 이미지 생성을 건너뜀
+    Image = None
+
+# 업로드된 사진의 파생 이미지(썸네일, 중간 크기) 생성 - CPU 작업이라 프로세스 풀에서 실행
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+MEDIUM_SIZE = (1080, 1080)
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", "2"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _variant_format() -> Tuple[str, str]:
+    if features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+def variant_paths(photo_path: str) -> Tuple[str, str]:
+    _, extension = _variant_format()
+    stem = os.path.splitext(photo_path)[0]
+    return f"{stem}_thumb.{extension}", f"{stem}_medium.{extension}"
+
+
+def render_variants(photo_path: str) -> Tuple[str, str]:
+    """
+    원본 사진으로 썸네일/중간 크기 이미지를 만들어 원본 옆에 저장 (프로세스 풀 워커에서 실행)
+    EXIF 회전값은 픽셀에 반영하고, 저장 시 EXIF(위치 정보 등)는 제거됨
+    """
+    image_format, _ = _variant_format()
+    paths = variant_paths(photo_path)
+
+    with Image.open(photo_path) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+        for variant_path, size in zip(paths, (THUMBNAIL_SIZE, MEDIUM_SIZE)):
+            variant = image.copy()
+            variant.thumbnail(size, Image.LANCZOS)
+            # 같은 사진을 동시에 처리하는 다른 작업과 임시 파일이 겹치지 않도록 고유한 이름 사용
+            temp_path = f"{variant_path}.{uuid.uuid4().hex}.part"
+            variant.save(temp_path, format=image_format, quality=80, optimize=True)
+            os.replace(temp_path, variant_path)
+
+    return paths
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=VARIANT_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def create_photo_variants(photo_model, photo_id: int, photo_path: str):
+    """
+    업로드 응답 이후 BackgroundTasks로 실행 - 파생 이미지를 만들고 사진 행에 경로 기록
+    """
+    if Image is None:
+        return
+
+    from crud import save_photo_variants
+    from database import SessionLocal
+
+    # 같은 내용의 사진이 이미 업로드되어 파생 이미지가 있으면 다시 만들지 않음
+    thumbnail_path, medium_path = variant_paths(photo_path)
+    if not (os.path.exists(thumbnail_path) and os.path.exists(medium_path)):
+        loop = asyncio.get_running_loop()
+        try:
+            thumbnail_path, medium_path = await loop.run_in_executor(get_pool(), render_variants, photo_path)
+        except Exception:
+            logger.exception("Failed to create variants for %s", photo_path)
+            return
+
+    db = SessionLocal()
+    try:
+        await run_in_threadpool(
+            save_photo_variants, db, photo_model, photo_id,
+            thumbnail_path.replace(os.sep, "/"), medium_path.replace(os.sep, "/"),
+        )
+    finally:
+        db.close()
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Request
+from sqlalchemy import exists, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# 사진 파일 업로드 - multipart 요청을 메모리에 모으지 않고 static/uploads 에 바로 스트리밍 저장
+# 파일은 내용 해시(sha256) 이름으로 저장되어 같은 사진은 한 번만 저장됨 (photo_blobs 테이블에서 참조 수 관리)
+
+UPLOAD_DIR = os.path.join("static", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))  # 기본 10MB
+UPLOAD_FIELD = "file"
+BLOB_EXTENSION = ".jpg"
+GC_GRACE_SECONDS = int(os.getenv("UPLOAD_GC_GRACE_SECONDS", "3600"))  # 업로드 직후 파일은 GC 대상에서 제외
+
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+BLOB_NAME = re.compile(r"^([0-9a-f]{64})(?:_[a-z]+)?\.[a-z0-9]+$")
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(UPLOAD_DIR, digest + BLOB_EXTENSION).replace(os.sep, "/")
+
+
+def blob_digest(photo_path: Optional[str]) -> Optional[str]:
+    """
+    내용 주소 파일 경로면 sha256 값을, 아니면(기존 파일, 클라이언트 경로) None 반환
+    """
+    if not photo_path:
+        return None
+    match = BLOB_NAME.match(os.path.basename(photo_path))
+    if not match or photo_path.replace(os.sep, "/") != blob_path(match.group(1)):
+        return None
+    return match.group(1)
+
+
+def _fsync_and_close(file):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:  # 디렉터리 fsync를 지원하지 않는 OS
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def remove_upload(photo_path: str):
+    try:
+        os.remove(photo_path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive_photo(request: Request) -> str:
+    """
+    multipart 요청의 "file" 파트를 청크 단위로 해싱하면서 임시 파일에 기록하고 저장된 경로를 반환
+    - 같은 내용의 파일이 이미 있으면 임시 파일을 버리고 기존 파일을 재사용
+    - 클라이언트가 X-Content-SHA256 헤더를 보내고 그 파일이 이미 있으면 디스크에 아예 쓰지 않음 (내용은 해시로 검증)
+    파일이 디스크에 완전히 기록(fsync)된 뒤에만 최종 이름으로 옮기므로 DB 저장은 반환 이후에 해야 함
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="multipart/form-data with a file field is required.")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_BYTES} bytes).")
+
+    state = {"header_field": b"", "header_value": b"", "is_target": False, "done": False, "size": 0, "found": False}
+    pending = []
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"], state["header_value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["is_target"] = not state["done"] and options.get(b"name") == UPLOAD_FIELD.encode() and b"filename" in options
+        state["found"] = state["found"] or state["is_target"]
+
+    def on_part_data(data, start, end):
+        if state["is_target"]:
+            state["size"] += end - start
+            pending.append(data[start:end])
+
+    def on_part_end():
+        if state["is_target"]:
+            state["is_target"], state["done"] = False, True
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    expected = (request.headers.get("x-content-sha256") or "").lower()
+    hash_only = bool(SHA256_HEX.match(expected)) and os.path.exists(blob_path(expected))
+
+    digest = hashlib.sha256()
+    temp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    file = None if hash_only else open(temp_path, "wb")
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except ValueError:  # 잘못된 multipart 형식
+                raise HTTPException(status_code=400, detail="Malformed multipart body.")
+            if state["size"] > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_BYTES} bytes).")
+            if pending:
+                data = b"".join(pending)
+                pending.clear()
+                digest.update(data)
+                if file is not None:
+                    await run_in_threadpool(file.write, data)
+        parser.finalize()
+
+        if not state["found"] or state["size"] == 0:
+            raise HTTPException(status_code=400, detail="No file uploaded.")
+
+        photo_path = blob_path(digest.hexdigest())
+        if file is None:
+            if digest.hexdigest() != expected:
+                raise HTTPException(status_code=400, detail="Content does not match X-Content-SHA256.")
+            os.utime(photo_path)  # GC 유예 시간 갱신
+            return photo_path
+
+        await run_in_threadpool(_fsync_and_close, file)
+        if os.path.exists(photo_path):
+            # 중복 업로드 - 이미 저장된 파일 재사용
+            remove_upload(temp_path)
+            os.utime(photo_path)
+        else:
+            os.replace(temp_path, photo_path)
+            _fsync_dir(UPLOAD_DIR)
+    except Exception:
+        if file is not None:
+            file.close()
+            remove_upload(temp_path)
+        raise
+
+    return photo_path
+
+
+def collect_garbage(db: Session, grace_seconds: int = GC_GRACE_SECONDS) -> dict:
+    """
+    참조되지 않는 내용 주소 파일(와 썸네일 등 파생 파일) 삭제
+    photo_blobs.ref_count 를 own_photos / meal_photos 의 실제 참조 수로 다시 맞춘 뒤
+    참조가 0이고 유예 시간이 지난 파일만 내용 해시 단위로 지움 (기존 {user_id}_{timestamp}.jpg 파일은 건드리지 않음)
+    """
+    from models import PhotoBlob
+
+    # 한 번의 UPDATE 로 재계산 - 동시에 커밋되는 사진 저장의 ref_count 증가를 덮어쓰지 않음
+    db.query(PhotoBlob).update({PhotoBlob.ref_count: _reference_count(PhotoBlob.path)}, synchronize_session=False)
+    db.commit()
+
+    now = time.time()
+    removed_blobs, removed_files = 0, 0
+    files = {}  # sha256 -> 원본 + 파생 파일 경로
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        if name.endswith(".part"):
+            if _expired(path, now, grace_seconds):  # 중단된 업로드의 임시 파일
+                remove_upload(path)
+                removed_files += 1
+            continue
+        match = BLOB_NAME.match(name)
+        if match:
+            files.setdefault(match.group(1), []).append(path)
+
+    referenced = {row.sha256 for row in db.query(PhotoBlob.sha256).filter(PhotoBlob.ref_count > 0)}
+    for digest, paths in files.items():
+        # 원본이나 파생 파일 중 하나라도 유예 중이면 모두 남겨 둠
+        if digest in referenced or not all(_expired(path, now, grace_seconds) for path in paths):
+            continue
+        if _remove_blob(db, digest, paths, grace_seconds):
+            removed_blobs += 1
+            removed_files += len(paths)
+
+    return {"removed_blobs": removed_blobs, "removed_files": removed_files}
+
+
+def _reference_count(path_column):
+    from models import MealPhoto, OwnPhoto
+
+    own = select(func.count(OwnPhoto.id)).where(OwnPhoto.photo_path == path_column).scalar_subquery()
+    meal = select(func.count(MealPhoto.id)).where(MealPhoto.photo_path == path_column).scalar_subquery()
+    return own + meal
+
+
+def _expired(path: str, now: float, grace_seconds: int) -> bool:
+    try:
+        return now - os.path.getmtime(path) >= grace_seconds
+    except FileNotFoundError:
+        return True
+
+
+def _remove_blob(db: Session, digest: str, paths: list, grace_seconds: int) -> bool:
+    """
+    photo_blobs 행에 쓰기 잠금을 잡은 상태에서 참조와 유예 시간을 다시 확인하고 파일 삭제
+    잠금은 커밋까지 유지되므로, 그 사이 이 파일을 재사용하는 사진 저장은 대기했다가
+    add_blob_reference 에서 파일이 없는 것을 확인하고 실패함 (삭제된 파일을 가리키는 행이 남지 않음)
+    """
+    from models import MealPhoto, OwnPhoto, PhotoBlob
+
+    path = blob_path(digest)
+    try:
+        locked = db.query(PhotoBlob).filter(PhotoBlob.sha256 == digest).update(
+            {PhotoBlob.ref_count: PhotoBlob.ref_count}, synchronize_session=False
+        )
+        if not locked:  # 행이 없는 파일 (사진 저장 전에 중단된 업로드) - 빈 행으로 잠금
+            db.add(PhotoBlob(sha256=digest, path=path, ref_count=0, created_at=datetime.now()))
+            db.flush()
+
+        ref_count = db.query(PhotoBlob.ref_count).filter(PhotoBlob.sha256 == digest).scalar()
+        in_use = ref_count or any(
+            db.query(exists().where(model.photo_path == path)).scalar() for model in (OwnPhoto, MealPhoto)
+        )
+        if in_use or not all(_expired(file_path, time.time(), grace_seconds) for file_path in paths):
+            db.rollback()
+            return False
+
+        for file_path in paths:
+            remove_upload(file_path)
+        db.query(PhotoBlob).filter(PhotoBlob.sha256 == digest).delete(synchronize_session=False)
+        db.commit()
+        return True
+    except IntegrityError:  # 동시에 같은 파일을 참조하는 사진이 저장됨
+        db.rollback()
+        return False
+
+
+if __name__ == "__main__":
+    # 수동 실행: python uploads.py  (cron 등으로 주기 실행)
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(collect_garbage(session))
+    finally:
+        session.close()
@@ -1,8 +1,12 @@
-import jwt
+import os
+from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from typing import Optional
 
-SECRET_KEY = "your_secret_key"
+JWT_SECRET_FROM_ENV = bool(os.getenv("JWT_SECRET_KEY"))  # False 이면 공개된 기본 키로 서명됨
+SECRET_KEY = os.getenv("JWT_SECRET_KEY") or "your_secret_key"
 ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -10,3 +14,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=30))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    서명과 만료 시간을 검증한 토큰 내용 반환 (유효하지 않으면 None)
+    """
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None